@@ -0,0 +1,121 @@
+"""
+It is a script that measures parse time of one page with the old BeautifulSoup find chains
+and with the compiled extraction specs. Run it from the repository root:
+
+    python benchmarks/bench_parse.py
+"""
+import datetime
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from server import read_fixture
+
+
+def legacy_djinni_vacancy(content):
+    """
+    legacy_djinni_vacancy is the djinni.co vacancy parser before compiled specs (for comparison).
+    """
+    from bs4 import BeautifulSoup
+
+    def convert_date(temp):
+        month = int(temp[1].replace('января', '1').replace('февраля', '2').replace('марта', '3')\
+                    .replace('апреля', '4').replace('мая', '5').replace('июня', '6')\
+                    .replace('июля', '7').replace('августа', '8').replace('сентября', '9')\
+                    .replace('октября', '10').replace('ноября', '11').replace('декабря', '12'))
+        return datetime.date(int(temp[2]), month, int(temp[0]))
+
+    results_page = BeautifulSoup(content, 'lxml')
+    position = results_page.find("div", class_="page-header").find("h1") \
+        .get_text().replace("\n", "").replace("  ", "")
+    specialization = results_page.find("div", class_="page-header")\
+        .find_all("li")[1].get_text().replace("\n", "")
+    city = results_page.find("div", class_="page-header")\
+        .find_all("li")[2].get_text().replace("\n", "")
+    title = results_page.find("p", class_="profile").get_text()
+    tmp_date = results_page.find("div", class_="profile-page-section text-small")\
+                   .get_text()\
+                   .replace("\n", "")\
+                   .replace(".", "")\
+                   .split(" ")[26:29]
+    published_date = convert_date(tmp_date)
+    recruiter = results_page.find("img", class_="list-jobs__userpic back-recruiter-image")\
+        .get('alt')
+    tmp_recr_comp = results_page.find("div", class_="list-jobs__details")\
+        .get_text()\
+        .replace("\n", "")\
+        .replace("\xa0", "")\
+        .split("   ")
+    if tmp_recr_comp[0] == "":
+        recruiter_company = tmp_recr_comp[8]
+    else:
+        recruiter_company = tmp_recr_comp[2]
+    tmp_recr_link = results_page.find("div", class_="list-jobs__details").find("a").get("href")
+    tmp_descritions = results_page.find_all("div", class_="profile-page-section")
+    descriptions = tmp_descritions[1].get_text().replace("\n", " ")
+    about_company = tmp_descritions[2].get_text().replace("\n", " ")
+    return {"position": position, "specialization": specialization, "city": city,
+            "title": title, "published_date": published_date, "recruiter": recruiter,
+            "recruiter_company": recruiter_company, "recruiter_link": tmp_recr_link,
+            "descriptions": descriptions, "about_company": about_company}
+
+
+def legacy_work_ua_listing(content):
+    """
+    legacy_work_ua_listing is the work.ua card parser before compiled specs (for comparison).
+    """
+    from bs4 import BeautifulSoup
+
+    sal = "nowrap"
+    results_page = BeautifulSoup(content, 'lxml')
+    results_page.find('b').get_text()
+    rows = []
+    for cards_class in ("card card-hover card-visited wordwrap job-link js-hot-block",
+                        "card card-hover card-visited wordwrap job-link"):
+        for j in results_page.find_all('div', class_=cards_class):
+            temp = j.a.get('title').split(", вакансія від ")
+            rows.append({
+                "vacancy_link": j.a.get("href"),
+                "vacancy_title": temp[0],
+                "publication_date": temp[1],
+                "company_title": None if j.b is None else j.b.get_text(),
+                "vacancy_salary": None if j.find('span', class_=sal) is None else
+                int(j.find('span', class_=sal).get_text().replace('\xa0', '')
+                    .replace('грн', '').replace('*', ''))})
+    return rows
+
+
+def measure(function, content, number=200):
+    """
+    measure is a function that returns mean time of one call in milliseconds.
+
+    :param function: parser
+    :param content: raw page content
+    :param number: number of calls
+    :return: float
+    """
+    return min(timeit.repeat(lambda: function(content), number=number, repeat=3)) / number * 1000
+
+
+def main():
+    from djinni_vacancies import parse_vacancy_page
+    from work_ua_vacancies import parse_listing_page
+
+    cases = [
+        ('djinni vacancy page', 'djinni_vacancy.html', legacy_djinni_vacancy,
+         lambda content: parse_vacancy_page('https://djinni.co/jobs/1/', content)),
+        ('work.ua listing page', 'work_ua_jobs.html', legacy_work_ua_listing,
+         lambda content: parse_listing_page(content, 'kyiv', 'it')),
+    ]
+    for name, fixture, before, after in cases:
+        content = read_fixture(fixture)
+        before_ms = measure(before, content)
+        after_ms = measure(after, content)
+        print(f'{name:22} before {before_ms:7.3f} ms/page   after {after_ms:7.3f} ms/page   '
+              f'x{before_ms / after_ms:.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+"""
+It is a script that measures throughput of every entry point against the local stand-in
+of djinni.co and work.ua and a local SQLite database. Run it from the repository root:
+
+    python benchmarks/run.py --latency 0.05 --save baseline.json
+    python benchmarks/run.py --latency 0.05 --baseline baseline.json
+
+It reports for every entry point:
+- rows/sec          rows that the entry point saved per second of the whole call
+- requests/row      requests to the stand-in per saved row (wasted requests make it grow)
+- parse ms/page     time to parse one recorded page
+- write ms/row      time that the entry point spent saving one row (the write stage
+                    of metrics.REGISTRY)
+
+The work.ua stand-in has a city/category with a short last page ('it') and
+a city/category with one short page ('management').
+
+With --baseline it exits with code 1 if any number is worse than the baseline by more
+than --tolerance.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_parse import measure  # noqa: E402
+from server import StandIn, read_fixture  # noqa: E402
+
+
+def registry_totals(entry_point):
+    """
+    registry_totals is a function that returns what metrics.REGISTRY has recorded
+    for an entry point so far.
+
+    :param entry_point: example: 'djinni.get_vacancies'
+    :return: (rows written, seconds of the write stage)
+    """
+    from metrics import REGISTRY
+
+    histograms, counters, _ = REGISTRY.snapshot()
+    rows = counters.get(('rows_written_total', (('entry_point', entry_point),)), 0)
+    write = histograms.get(('stage_seconds', (('entry_point', entry_point), ('stage', 'write'))))
+    return rows, 0.0 if write is None else write['sum']
+
+
+def run_entry_point(server, entry_point, function):
+    """
+    run_entry_point is a function that calls an entry point with its output hidden.
+
+    :param server: StandIn that the entry point downloads from
+    :param entry_point: entry point for metrics. Example: 'djinni.get_vacancies'
+    :param function: function without arguments
+    :return: (result of the function, dict with rows/sec, requests/row and write ms/row)
+    """
+    requests_before = server.requests
+    rows_before, write_before = registry_totals(entry_point)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = function()
+    seconds = time.perf_counter() - start
+    rows_after, write_after = registry_totals(entry_point)
+    rows = max(rows_after - rows_before, 1)
+    return result, {'rows/sec': rows / seconds,
+                    'requests/row': (server.requests - requests_before) / rows,
+                    'write ms/row': (write_after - write_before) / rows * 1000}
+
+
+def run(latency, djinni_pages, work_ua_pages, workers, processes=0):
+    """
+    run is a function that runs all entry points in a temporary directory
+    (crawl state and the SQLite database are created there) and returns their numbers.
+
+    :return: dict entry point -> {'rows/sec': ..., 'requests/row': ..., 'parse ms/page': ...,
+                                  'write ms/row': ...}
+    """
+    working_directory = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory, \
+            StandIn('djinni', latency, djinni_pages=djinni_pages) as djinni, \
+            StandIn('work_ua', latency, work_ua_vacancies={
+                'it': (work_ua_pages - 1) * 14 + 5, 'management': 5}) as work_ua:
+        os.chdir(directory)
+        try:
+            return run_entry_points(djinni, work_ua, directory, workers, processes)
+        finally:
+            os.chdir(working_directory)
+
+
+def run_entry_points(djinni, work_ua, directory, workers, processes=0):
+    """
+    run_entry_points is a function that runs all entry points against the stand-ins.
+
+    :param djinni: StandIn of djinni.co
+    :param work_ua: StandIn of work.ua
+    :param directory: directory for the SQLite database
+    :param workers: number of pages that are downloaded at the same time
+    :param processes: number of processes that parse pages (see pipeline.ParsePool)
+    :return: dict entry point -> numbers
+    """
+    from sqlalchemy import create_engine
+
+    import djinni_vacancies
+    import work_ua_vacancies
+    from crawl_state import GeocodeCache
+    from extraction import DJINNI_LISTING, WORK_UA_CATEGORIES, extract
+
+    results = {}
+    engine = create_engine(f'sqlite:///{os.path.join(directory, "bench.sqlite3")}')
+    cache = GeocodeCache()
+    for region_id in range(0, 200, 20):
+        cache.put(f'city{region_id}', 50.45, 30.52)
+
+    links, numbers = run_entry_point(
+        djinni, 'djinni.get_vacancy_links',
+        lambda: djinni_vacancies.get_vacancy_links(engine=engine, site_link=djinni.site_link))
+    results['djinni.get_vacancy_links'] = dict(numbers, **{
+        'parse ms/page': measure(lambda content: extract(DJINNI_LISTING, content),
+                                 read_fixture('djinni_jobs.html'))})
+
+    _, numbers = run_entry_point(
+        djinni, 'djinni.get_vacancies',
+        lambda: djinni_vacancies.get_vacancies(links, workers=workers, engine=engine,
+                                               site_link=djinni.site_link, processes=processes))
+    results['djinni.get_vacancies'] = dict(numbers, **{
+        'parse ms/page': measure(lambda content: djinni_vacancies.parse_vacancy_page(
+            'https://djinni.co/jobs/1/', content), read_fixture('djinni_vacancy.html'))})
+
+    cities, numbers = run_entry_point(
+        work_ua, 'work_ua.get_cities',
+        lambda: work_ua_vacancies.get_cities(workers=workers, region_ids=range(0, 200),
+                                             engine=engine, site_link=work_ua.site_link,
+                                             processes=processes))
+    results['work_ua.get_cities'] = dict(numbers, **{
+        'parse ms/page': measure(work_ua_vacancies.parse_city_page,
+                                 read_fixture('work_ua_city.html'))})
+
+    categories, numbers = run_entry_point(
+        work_ua, 'work_ua.get_categories',
+        lambda: work_ua_vacancies.get_categories(engine=engine, site_link=work_ua.site_link))
+    results['work_ua.get_categories'] = dict(numbers, **{
+        'parse ms/page': measure(lambda content: extract(WORK_UA_CATEGORIES, content),
+                                 read_fixture('work_ua_categories.html'))})
+
+    _, numbers = run_entry_point(
+        work_ua, 'work_ua.get_vacancies',
+        lambda: work_ua_vacancies.get_vacancies(cities[:3], categories[:2], engine=engine,
+                                                site_link=work_ua.site_link, workers=workers,
+                                                processes=processes))
+    results['work_ua.get_vacancies'] = dict(numbers, **{
+        'parse ms/page': measure(lambda content: work_ua_vacancies.parse_listing_page(
+            content, 'kyiv', 'it'), read_fixture('work_ua_jobs.html'))})
+    engine.dispose()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    compare is a function that returns a list of regressions against a baseline.
+
+    :param results: numbers of this run
+    :param baseline: numbers of the baseline run
+    :param tolerance: allowed relative change, example: 0.3
+    :return: list of strings
+    """
+    regressions = []
+    for entry_point, numbers in results.items():
+        for name, value in numbers.items():
+            old = baseline.get(entry_point, {}).get(name)
+            if old is None:
+                continue
+            worse = value < old * (1 - tolerance) if name == 'rows/sec' \
+                else value > old * (1 + tolerance)
+            if worse:
+                regressions.append(f'{entry_point} {name}: {old:.3f} -> {value:.3f}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds per response')
+    parser.add_argument('--djinni-pages', type=int, default=10)
+    parser.add_argument('--work-ua-pages', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--processes', type=int, default=0,
+                        help='processes that parse pages, 0 means parsing in download threads')
+    parser.add_argument('--save', help='save numbers to a JSON file')
+    parser.add_argument('--baseline', help='JSON file saved with --save to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.3)
+    arguments = parser.parse_args()
+
+    results = run(arguments.latency, arguments.djinni_pages, arguments.work_ua_pages,
+                  arguments.workers, arguments.processes)
+    print(f'{"entry point":28}{"rows/sec":>12}{"requests/row":>14}{"parse ms/page":>16}'
+          f'{"write ms/row":>15}')
+    for entry_point, numbers in results.items():
+        print(f'{entry_point:28}{numbers["rows/sec"]:12.1f}{numbers["requests/row"]:14.3f}'
+              f'{numbers["parse ms/page"]:16.3f}{numbers["write ms/row"]:15.4f}')
+    if arguments.save:
+        with open(arguments.save, 'w') as file:
+            json.dump(results, file, indent=2)
+    if arguments.baseline:
+        with open(arguments.baseline) as file:
+            regressions = compare(results, json.load(file), arguments.tolerance)
+        for regression in regressions:
+            print('REGRESSION', regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""
+It is a module that has a local HTTP stand-in for djinni.co and work.ua.
+It serves the recorded pages from benchmarks/fixtures with a configurable latency,
+so the entry points can be measured without the live sites.
+"""
+import functools
+import hashlib
+import math
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def read_fixture(name):
+    """
+    read_fixture is a function that returns raw content of a recorded page.
+
+    :param name: file name in benchmarks/fixtures
+    :return: bytes
+    """
+    with open(os.path.join(FIXTURES, name), 'rb') as file:
+        return file.read()
+
+
+def djinni_page(path, query, config):
+    """
+    djinni_page is a function that returns a djinni.co page for a path.
+    Listing pages get unique vacancy links and the number of vacancies from config.
+    """
+    if path == '/jobs/':
+        page = int((query.get('page') or ['0'])[0] or 0)
+        content = read_fixture('djinni_jobs.html').decode('utf-8')
+        content = content.replace('<small class="text-muted">3000</small>',
+                                  f'<small class="text-muted">{config["djinni_pages"] * 15}</small>')
+        content = re.sub(r'/jobs/520(\d\d)-',
+                         lambda match: f'/jobs/{page * 100 + int(match.group(1))}-', content)
+        return content.encode('utf-8')
+    if re.fullmatch(r'/jobs/[^/]+/', path):
+        return read_fixture('djinni_vacancy.html')
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def work_ua_listing(cards):
+    """
+    work_ua_listing is a function that returns the recorded work.ua listing page with only
+    the first cards of its 14 regular cards (the hot cards are kept).
+
+    :param cards: number of regular cards, from 1 to 14
+    :return: str
+    """
+    import lxml.html
+
+    content = read_fixture('work_ua_jobs.html').decode('utf-8')
+    if cards >= 14:
+        return content
+    tree = lxml.html.fromstring(content)
+    regular = tree.xpath('//div[@class="card card-hover card-visited wordwrap job-link"]')
+    for card in regular[cards:]:
+        card.getparent().remove(card)
+    return lxml.html.tostring(tree, encoding='unicode', doctype='<!DOCTYPE html>')
+
+
+def work_ua_page(path, query, config):
+    """
+    work_ua_page is a function that returns a work.ua page for a path.
+    Every config['city_every'] region id is a city. A city/category has
+    config['work_ua_vacancies'] regular vacancies (a number or a dict category -> number),
+    14 per page, so its last page can be short.
+    """
+    if path == '/jobs/' and 'region' in query:
+        region_id = int(query['region'][0])
+        if region_id % config['city_every']:
+            return read_fixture('work_ua_no_city.html')
+        content = read_fixture('work_ua_city.html').decode('utf-8')
+        return content.replace('/jobs-kyiv/', f'/jobs-city{region_id}/').encode('utf-8')
+    if path == '/jobs-kyiv/':
+        return read_fixture('work_ua_categories.html')
+    match = re.fullmatch(r'/jobs-[^/]+-([^/]+)/', path)
+    if match:
+        vacancies = config['work_ua_vacancies']
+        if isinstance(vacancies, dict):
+            vacancies = vacancies.get(match.group(1), 0)
+        total = vacancies if config['work_ua_total'] is None else config['work_ua_total']
+        page = int((query.get('page') or ['1'])[0])
+        if page > math.ceil(vacancies / 14):
+            return read_fixture('work_ua_jobs_empty.html')
+        content = work_ua_listing(min(14, vacancies - (page - 1) * 14))
+        content = content.replace('Знайдено 1 234 вакансії', f'Знайдено {total} вакансій')
+        content = re.sub(r'/jobs/34300(\d\d)/',
+                         lambda match: f'/jobs/{page * 100 + int(match.group(1))}/', content)
+        return content.encode('utf-8')
+    return None
+
+
+class StandIn:
+    """
+    StandIn is a class that runs a local HTTP server for one site in a background thread.
+
+        with StandIn('djinni', latency=0.05) as server:
+            get_vacancy_links(engine=engine, site_link=server.site_link)
+
+    :param site: 'djinni' or 'work_ua'
+    :param latency: seconds to wait before every response
+    :param djinni_pages: number of djinni.co listing pages
+    :param work_ua_pages: number of full work.ua pages for every city/category
+                          (used if work_ua_vacancies is None)
+    :param work_ua_total: number of vacancies that work.ua pages report (None means
+                          the number of regular cards on all pages)
+    :param city_every: every city_every work.ua region id is a city
+    :param work_ua_vacancies: number of regular vacancies of every city/category or
+                              dict category -> number (14 per page, the last page can be
+                              short, categories that are not in the dict have none)
+    """
+
+    def __init__(self, site, latency=0.05, djinni_pages=10, work_ua_pages=5, city_every=20,
+                 work_ua_total=None, work_ua_vacancies=None):
+        if work_ua_vacancies is None:
+            work_ua_vacancies = work_ua_pages * 14
+        config = {'djinni_pages': djinni_pages, 'work_ua_vacancies': work_ua_vacancies,
+                  'work_ua_total': work_ua_total, 'city_every': city_every}
+        render = djinni_page if site == 'djinni' else work_ua_page
+        stand_in = self
+        self.requests = 0
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+            wbufsize = 1 << 16
+
+            def do_GET(self):
+                time.sleep(latency)
+                url = urlsplit(self.path)
+                content = render(url.path, parse_qs(url.query, keep_blank_values=True), config)
+                etag = f'"{hashlib.md5(content or b"").hexdigest()}"'
+                if content is not None and self.headers.get('If-None-Match') == etag:
+                    content, status = b'', 304
+                else:
+                    status = 404 if content is None else 200
+                with stand_in.lock:
+                    stand_in.requests += 1
+                    stand_in.bytes += len(content or b'')
+                self.send_response(status)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(content or b'')))
+                self.end_headers()
+                self.wfile.write(content or b'')
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.site_link = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.server.shutdown()
+        self.server.server_close()
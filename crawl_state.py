@@ -0,0 +1,300 @@
+"""
+It is a module that keeps local state of crawls between runs in a SQLite file.
+"""
+import datetime
+import sqlite3
+
+STATE_PATH = 'crawl_state.sqlite3'
+
+
+def open_state(path=STATE_PATH):
+    """
+    open_state is a function that opens the SQLite file with crawl state.
+
+    :param path: path to the SQLite file
+    :return: sqlite3.Connection
+    """
+    connection = sqlite3.connect(path, check_same_thread=False)
+    connection.execute('PRAGMA journal_mode=WAL')
+    return connection
+
+
+class SeenIndex:
+    """
+    SeenIndex is a class that remembers vacancies that were already scraped.
+    For every vacancy it keeps (site, vacancy_key, first_seen, last_seen), where
+    vacancy_key is a vacancy link for djinni.co and 'vacancy_id/city/category' for work.ua
+    (a work.ua vacancy is listed under many cities and categories).
+
+    :param site: example: 'djinni' or 'work_ua'
+    :param path: path to the SQLite file
+    """
+
+    def __init__(self, site, path=STATE_PATH):
+        self.site = site
+        self.connection = open_state(path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS seen_vacancies ('
+                                'site TEXT NOT NULL, '
+                                'vacancy_key TEXT NOT NULL, '
+                                'first_seen TEXT NOT NULL, '
+                                'last_seen TEXT NOT NULL, '
+                                'PRIMARY KEY (site, vacancy_key))')
+        self.connection.commit()
+
+    def known(self, keys):
+        """
+        known is a method that returns keys that are already in the index.
+
+        :param keys: iterable of vacancy keys
+        :return: set of known vacancy keys
+        """
+        keys = [str(key) for key in keys if key is not None]
+        found = set()
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            rows = self.connection.execute(
+                'SELECT vacancy_key FROM seen_vacancies WHERE site = ? AND vacancy_key IN '
+                f'({", ".join("?" * len(chunk))})', [self.site] + chunk)
+            found.update(row[0] for row in rows)
+        return found
+
+    def mark_seen(self, keys):
+        """
+        mark_seen is a method that adds keys to the index or updates their last_seen time.
+
+        :param keys: iterable of vacancy keys
+        :return: None
+        """
+        now = datetime.datetime.now().isoformat(sep=' ', timespec='seconds')
+        self.connection.executemany(
+            'INSERT INTO seen_vacancies (site, vacancy_key, first_seen, last_seen) '
+            'VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (site, vacancy_key) DO UPDATE SET last_seen = excluded.last_seen',
+            [(self.site, str(key), now, now) for key in keys if key is not None])
+        self.connection.commit()
+
+    def touch(self, keys):
+        """
+        touch is a method that updates last_seen time of keys that are already in the index.
+
+        :param keys: iterable of vacancy keys
+        :return: None
+        """
+        now = datetime.datetime.now().isoformat(sep=' ', timespec='seconds')
+        self.connection.executemany(
+            'UPDATE seen_vacancies SET last_seen = ? WHERE site = ? AND vacancy_key = ?',
+            [(now, self.site, str(key)) for key in keys if key is not None])
+        self.connection.commit()
+
+
+class CityRegistry:
+    """
+    CityRegistry is a class that remembers results of probing work.ua region ids.
+    For every probed id it keeps the city (or NULLs if the id is not a city) and probe time,
+    so the next run only probes ids that were never probed or are too old.
+
+    :param path: path to the SQLite file
+    """
+
+    def __init__(self, path=STATE_PATH):
+        self.connection = open_state(path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS work_ua_regions ('
+                                'region_id INTEGER PRIMARY KEY, '
+                                'city_name TEXT, '
+                                'city_lat_name TEXT, '
+                                'city_link TEXT, '
+                                'probed_at TEXT NOT NULL)')
+        self.connection.commit()
+
+    def ids_to_probe(self, region_ids, max_age=None, non_city_max_age=None):
+        """
+        ids_to_probe is a method that returns region ids that have to be probed.
+
+        :param region_ids: iterable of all region ids
+        :param max_age: datetime.timedelta, ids probed earlier than that are probed again
+                        (None means probed ids are never probed again)
+        :param non_city_max_age: datetime.timedelta, ids that were not cities and were probed
+                                 earlier than that are probed again, so new cities
+                                 (and ids that got an error page) are found
+                                 (None means max_age is used for them too)
+        :return: list of region ids
+        """
+        now = datetime.datetime.now()
+
+        def oldest(age):
+            return None if age is None else (now - age).isoformat(sep=' ', timespec='seconds')
+
+        oldest_city, oldest_non_city = oldest(max_age), oldest(non_city_max_age or max_age)
+        probed = {region_id: (probed_at, city_lat_name) for region_id, probed_at, city_lat_name
+                  in self.connection.execute('SELECT region_id, probed_at, city_lat_name '
+                                             'FROM work_ua_regions')}
+        to_probe = []
+        for region_id in region_ids:
+            if region_id not in probed:
+                to_probe.append(region_id)
+                continue
+            probed_at, city_lat_name = probed[region_id]
+            limit = oldest_city if city_lat_name is not None else oldest_non_city
+            if limit is not None and probed_at < limit:
+                to_probe.append(region_id)
+        return to_probe
+
+    def record(self, region_id, city=None):
+        """
+        record is a method that saves result of probing one region id.
+
+        :param region_id: work.ua region id
+        :param city: dict with city_name, city_lat_name and city_link or None if it is not a city
+        :return: None
+        """
+        city = city or {}
+        now = datetime.datetime.now().isoformat(sep=' ', timespec='seconds')
+        self.connection.execute(
+            'INSERT OR REPLACE INTO work_ua_regions '
+            '(region_id, city_name, city_lat_name, city_link, probed_at) VALUES (?, ?, ?, ?, ?)',
+            (region_id, city.get('city_name'), city.get('city_lat_name'), city.get('city_link'), now))
+        self.connection.commit()
+
+    def cities(self):
+        """
+        cities is a method that returns all known cities ordered by region id.
+
+        :return: list of dicts with city_id, city_name, city_lat_name and city_link
+        """
+        rows = self.connection.execute(
+            'SELECT region_id, city_name, city_lat_name, city_link FROM work_ua_regions '
+            'WHERE city_lat_name IS NOT NULL ORDER BY region_id')
+        return [{"city_id": row[0], "city_name": row[1], "city_lat_name": row[2],
+                 "city_link": row[3]} for row in rows]
+
+
+class GeocodeCache:
+    """
+    GeocodeCache is a class that remembers coordinates of cities between runs.
+    Cities that the geocoder could not find are kept with NULL coordinates,
+    so they are not looked up again. It is seeded from ll.py.
+
+    :param path: path to the SQLite file
+    """
+
+    def __init__(self, path=STATE_PATH):
+        from ll import ll
+
+        self.connection = open_state(path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS geocodes ('
+                                'city_lat_name TEXT PRIMARY KEY, '
+                                'city_latitude REAL, '
+                                'city_longitude REAL, '
+                                'resolved_at TEXT NOT NULL)')
+        self.connection.executemany(
+            'INSERT OR IGNORE INTO geocodes VALUES (?, ?, ?, ?)',
+            [(name.strip(), point['city_latitude'], point['city_longitude'], 'll.py')
+             for name, point in ll.items()])
+        self.connection.commit()
+
+    def get(self, city_lat_names):
+        """
+        get is a method that returns cached coordinates.
+
+        :param city_lat_names: iterable of city_lat_name
+        :return: dict city_lat_name -> (latitude, longitude), both are None for negative results
+        """
+        found = {}
+        city_lat_names = list(city_lat_names)
+        for i in range(0, len(city_lat_names), 500):
+            chunk = city_lat_names[i:i + 500]
+            rows = self.connection.execute(
+                'SELECT city_lat_name, city_latitude, city_longitude FROM geocodes '
+                f'WHERE city_lat_name IN ({", ".join("?" * len(chunk))})', chunk)
+            found.update((row[0], (row[1], row[2])) for row in rows)
+        return found
+
+    def put(self, city_lat_name, latitude, longitude):
+        """
+        put is a method that saves coordinates of one city (None, None for a negative result).
+
+        :param city_lat_name: example: 'kyiv'
+        :param latitude: float or None
+        :param longitude: float or None
+        :return: None
+        """
+        now = datetime.datetime.now().isoformat(sep=' ', timespec='seconds')
+        self.connection.execute('INSERT OR REPLACE INTO geocodes VALUES (?, ?, ?, ?)',
+                                (city_lat_name, latitude, longitude, now))
+        self.connection.commit()
+
+
+class CrawlJournal:
+    """
+    CrawlJournal is a class that remembers which units of a crawl run (pages, vacancy urls,
+    city/category pairs) are already saved into the database, so an interrupted run is resumed
+    without downloading them again. A run is one entity table of one database and
+    one crawl date (see storage.py).
+
+    sink.BufferedWriter marks units completed after the batch with their rows is saved.
+    Rows are saved with storage.upsert, so if the run was interrupted between saving a batch
+    and marking its units, saving them again on resume does not duplicate rows.
+    If the table was dropped, the run starts from the beginning.
+
+    :param engine: a sqlalchemy engine of the target table
+    :param table: entity table name. Example: 'djinni_vacancies'
+    :param crawl_date: datetime.date of the run (today if None)
+    :param path: path to the SQLite file
+    """
+
+    def __init__(self, engine, table, crawl_date=None, path=STATE_PATH):
+        self.engine = engine
+        self.table = table
+        self.crawl_date = crawl_date or datetime.date.today()
+        self.run = f'{engine.url!r} {table} {self.crawl_date}'
+        self.connection = open_state(path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS crawl_journal ('
+                                'run TEXT NOT NULL, '
+                                'unit TEXT NOT NULL, '
+                                'completed_at TEXT NOT NULL, '
+                                'PRIMARY KEY (run, unit))')
+        self.connection.commit()
+
+    def recover(self):
+        """
+        recover is a method that returns units that are already saved
+        (the run is cleared if its table does not exist).
+
+        :return: set of completed units
+        """
+        with self.engine.connect() as connection:
+            exists = self.engine.dialect.has_table(connection, self.table)
+        if not exists:
+            self.clear()
+        return self.completed()
+
+    def completed(self):
+        """
+        completed is a method that returns units that are already saved.
+
+        :return: set of units
+        """
+        rows = self.connection.execute('SELECT unit FROM crawl_journal WHERE run = ?',
+                                       (self.run,))
+        return {row[0] for row in rows}
+
+    def complete(self, units):
+        """
+        complete is a method that marks units of a saved batch completed.
+
+        :param units: list of units
+        :return: None
+        """
+        now = datetime.datetime.now().isoformat(sep=' ', timespec='seconds')
+        self.connection.executemany('INSERT OR IGNORE INTO crawl_journal VALUES (?, ?, ?)',
+                                    [(self.run, str(unit), now) for unit in units])
+        self.connection.commit()
+
+    def clear(self):
+        """
+        clear is a method that forgets the run, so it starts from the beginning.
+
+        :return: None
+        """
+        self.connection.execute('DELETE FROM crawl_journal WHERE run = ?', (self.run,))
+        self.connection.commit()
@@ -1,6 +1,9 @@
 """
 It is a script that has functions to parse djinni.co site.
 """
+import time
+
+SITE_LINK = 'https://djinni.co'
 
 
 def connect_to_database(host=False, database=False, username=False, password=False):
@@ -29,58 +32,284 @@ def connect_to_database(host=False, database=False, username=False, password=Fal
     return create_engine(f'postgresql://{username}:{password}@{host}/{database}')
 
 
-def get_vacancy_links():
+def iter_vacancy_links(batch_size=1000, flush_interval=30, incremental=False, engine=None,
+                       site_link=SITE_LINK, resume=True):
+    """
+    iter_vacancy_links is a generator of all vacancy links from djinni.co site.
+    Links are yielded page by page as soon as they are parsed, so vacancies can be
+    downloaded before all links are known:
+
+        for vacancy in iter_vacancies(iter_vacancy_links()):
+            ...
+
+    If engine is given, links are also saved in SQL database (see get_vacancy_links).
+
+    :param batch_size: number of links that are saved into database at once
+    :param flush_interval: number of seconds after which parsed links are saved
+                           when the next one is parsed (see sink.BufferedWriter)
+    :param incremental: if True, links of vacancies that were already scraped are skipped
+                        and pagination stops on the first page that has only such links
+    :param engine: a sqlalchemy engine or None if links are not saved
+    :param site_link: djinni.co address
+    :param resume: if True, pages that were saved by an interrupted run of the same day
+                   are not downloaded again, their saved links are yielded first
+                   (only with engine, see crawl_state.CrawlJournal)
+    :return: generator of dicts {"vacancy_link": ...}
+    """
+    import datetime
+    from functools import partial
+
+    from crawl_state import CrawlJournal, SeenIndex
+    from extraction import DJINNI_LISTING, extract
+    from fetching import fetch
+    from metrics import REGISTRY
+    from sink import BufferedWriter
+    from storage import read_entity, upsert
+
+    entry_point = 'djinni.get_vacancy_links'
+    page_url = f"{site_link}/jobs/?page="
+    first_page = extract(DJINNI_LISTING, fetch(page_url, entry_point))
+    numbers_of_vacancies = int(first_page['numbers_of_vacancies'])
+    numbers_of_pages = round(numbers_of_vacancies / 15) + 1
+    seen = SeenIndex('djinni')
+    writer = None
+    completed_pages = set()
+    if engine is not None:
+        journal = CrawlJournal(engine, 'djinni_vacancy_links', datetime.date.today())
+        if not resume:
+            journal.clear()
+        completed_pages = journal.recover()
+        writer = BufferedWriter(engine, journal.table, batch_size=batch_size,
+                                flush_interval=flush_interval, entry_point=entry_point,
+                                journal=journal,
+                                save=partial(upsert, crawl_date=journal.crawl_date))
+    try:
+        if completed_pages:
+            # links of saved pages may not be downloaded as vacancies yet
+            saved_links = read_entity(engine, journal.table, journal.crawl_date)
+            yield from ({"vacancy_link": link} for link in saved_links.vacancy_link)
+        for i in range(1, numbers_of_pages):
+            if str(i) in completed_pages:
+                continue
+            content = fetch(f'{page_url}{i}', entry_point)
+            with REGISTRY.timed('parse', entry_point):
+                results_page = extract(DJINNI_LISTING, content)
+            with REGISTRY.timed('normalize', entry_point):
+                vacancy_links = [{"vacancy_link": f'{site_link}{href}'}
+                                 for href in results_page['vacancy_links']]
+            if incremental:
+                known_links = seen.known(row['vacancy_link'] for row in vacancy_links)
+                seen.touch(known_links)
+                if len(known_links) == len(vacancy_links):
+                    break
+                vacancy_links = [row for row in vacancy_links
+                                 if row['vacancy_link'] not in known_links]
+            if writer is not None:
+                writer.write_many(vacancy_links, unit=str(i))
+            yield from vacancy_links
+    finally:
+        if writer is not None:
+            writer.flush()
+
+
+def get_vacancy_links(batch_size=1000, flush_interval=30, incremental=False, engine=None,
+                      site_link=SITE_LINK, resume=True):
     """
     get_vacancy_links is a function to get all vacancy links from djinni.co site.
-    It saves all links in SQL database.
+    It saves all links in SQL database (djinni_vacancy_links table, see storage.py).
 
+    :param batch_size: number of links that are saved into database at once
+    :param flush_interval: number of seconds after which parsed links are saved
+                           when the next one is parsed (see sink.BufferedWriter)
+    :param incremental: if True, links of vacancies that were already scraped are not saved
+                        and pagination stops on the first page that has only such links
+    :param engine: a sqlalchemy engine (connect_to_database() asks for connection data if None)
+    :param site_link: djinni.co address
+    :param resume: if True, pages that were saved by an interrupted run of the same day
+                   are not downloaded again (see crawl_state.CrawlJournal),
+                   if False, the run starts from the first page
     :return = pandas.DataFrame that has all vacancy links from djinni.co site
     """
 
     import datetime
 
-    import pandas as pd
-    import requests
-    from bs4 import BeautifulSoup
+    from storage import read_entity
 
-    site_link = 'https://djinni.co'
-    page_url = f"{site_link}/jobs/?page="
-    jobs_item = "list-jobs__item"
-    first_response = requests.get(page_url)
-    first_page = BeautifulSoup(first_response.content, 'lxml')
-    numbers_of_vacancies = int(first_page.find('small', class_="text-muted").get_text())
-    numbers_of_pages = round(numbers_of_vacancies / 15) + 1
-    engine = connect_to_database()
+    if engine is None:
+        engine = connect_to_database()
     all_time = datetime.datetime.now()
-    for i in range(1, numbers_of_pages):
-        start = datetime.datetime.now()
-        response = requests.get(f'{page_url}{i}')
-        results_page = BeautifulSoup(response.content, 'lxml')
-        items = results_page.find_all('li', class_=jobs_item)
-        vacancy_links = (list(map(lambda j: None if j.div is None else\
-            f'{site_link}{j.find("a", class_="profile").get("href")}', items)))
-        data = {"vacancy_link": vacancy_links}
-        temp_result = pd.DataFrame.from_dict(data)
-        temp_result.to_sql(f'djinni_vacancy_links2_{datetime.date.today()}',
-                           engine,
-                           if_exists='append')
-        print(f'{i}, {page_url}{i}', datetime.datetime.now() - start)
-
-    query = f'SELECT vacancy_link FROM public."djinni_vacancy_links2_{datetime.date.today()}";'
-    vacancy_links_df = pd.read_sql(query, engine)
-
-    del engine, site_link, jobs_item,
-    print(f'{numbers_of_pages - 1} pages were parsed,'
-          f' {numbers_of_vacancies} vacancy links was saved it took '
+    crawl_date = datetime.date.today()
+    numbers_of_links = sum(1 for _ in iter_vacancy_links(batch_size, flush_interval, incremental,
+                                                         engine, site_link, resume))
+    vacancy_links_df = read_entity(engine, 'djinni_vacancy_links', crawl_date)
+
+    del engine
+    print(f'{numbers_of_links} vacancy links were saved, it took '
           f'{datetime.datetime.now() - all_time}')
     return vacancy_links_df
 
 
-def get_vacancies(vacancy_links_df):
+def parse_vacancy_page(url, content, site_link=SITE_LINK):
+    """
+    parse_vacancy_page is a function to parse one vacancy page from djinni.co site.
+
+    :param url: vacancy link
+    :param content: raw page content
+    :param site_link: djinni.co address
+    :return: dict with information about vacancy (see get_vacancies)
+    """
+    from extraction import DJINNI_VACANCY, extract, parse_date
+    from metrics import REGISTRY
+
+    entry_point = 'djinni.get_vacancies'
+    with REGISTRY.timed('parse', entry_point):
+        results_page = extract(DJINNI_VACANCY, content)
+    start = time.perf_counter()
+    position = results_page['position']
+    header_items = results_page['header_items']
+    specialization = header_items[1] if len(header_items) > 1 else None
+    if len(header_items) > 2:
+        city = header_items[2]
+    else:
+        city = specialization
+        specialization = None
+    title = results_page['title']
+    published_date = parse_date(results_page['published'])
+    recruiter = results_page['recruiter']
+    recruiter_company = results_page['recruiter_company']
+    recruiter_link = None
+    if results_page['recruiter_link'] is not None:
+        recruiter_link = f'{site_link}{results_page["recruiter_link"]}'
+    sections = results_page['sections']
+    descriptions = sections[1] if len(sections) > 1 else None
+    about_company = sections[2] if len(sections) > 2 else None
+    if about_company is not None and 'Вакансия опубликована' in about_company:
+        about_company = None
+
+    data = {"vacancy_link": url, "position": position,
+            "specialization": specialization, "city": city,
+            "title": title, "published_date": published_date,
+            "recruiter": recruiter, "recruiter_company": recruiter_company,
+            "recruiter_link": recruiter_link, "descriptions": descriptions,
+            "about_company": about_company}
+    REGISTRY.observe('stage_seconds', time.perf_counter() - start,
+                     entry_point=entry_point, stage='normalize')
+    return data
+
+
+def iter_vacancies(vacancy_links, workers=8, batch_size=1000, flush_interval=30,
+                   incremental=False, engine=None, site_link=SITE_LINK, resume=True,
+                   processes=0, state_path='crawl_state.sqlite3',
+                   index_path='vacancy_index.sqlite3'):
+    """
+    iter_vacancies is a generator of vacancies from djinni.co site (see get_vacancies).
+    Vacancies are yielded as soon as their pages are parsed and links are read lazily,
+    so iter_vacancies(iter_vacancy_links()) downloads vacancies while links are still
+    being found. Memory does not grow with the number of vacancies.
+    If engine is given, vacancies are also saved in SQL database.
+    Parsed vacancies are remembered in the seen index (see crawl_state.SeenIndex) and
+    added to the full-text index (see search_index.VacancyIndex) after every saved batch,
+    or after every batch_size yielded vacancies if engine is None.
+
+    :param vacancy_links: pandas.DataFrame with vacancy_link column or iterable of links
+                          or of dicts with vacancy_link (like iter_vacancy_links yields)
+    :param workers: number of vacancy pages that are downloaded at the same time
+    :param batch_size: number of vacancies that are saved into database at once
+    :param flush_interval: number of seconds after which parsed vacancies are saved
+                           when the next one is parsed (see sink.BufferedWriter)
+    :param incremental: if True, vacancies that were already scraped are skipped
+    :param engine: a sqlalchemy engine or None if vacancies are not saved
+    :param site_link: djinni.co address
+    :param resume: if True, vacancies that were saved by an interrupted run of the same day
+                   are not downloaded again (only with engine, see crawl_state.CrawlJournal)
+    :param processes: number of processes that parse pages (see pipeline.ParsePool),
+                      0 means pages are parsed by the downloading threads
+    :param state_path: path to the SQLite file with crawl state (seen vacancies and
+                       the journal) or None to keep no state (no incremental or resume)
+    :param index_path: path to the SQLite file with the full-text index
+                       or None if vacancies are not indexed
+    :return: generator of dicts with information about vacancies
+    """
+    import datetime
+    from functools import partial
+
+    import pandas as pd
+    from crawl_state import CrawlJournal, SeenIndex
+    from fetching import fetch_pages
+    from pipeline import ParsePool
+    from search_index import VacancyIndex
+    from sink import BufferedWriter
+    from storage import upsert
+
+    if isinstance(vacancy_links, pd.DataFrame):
+        vacancy_links = vacancy_links.vacancy_link
+    vacancy_links = (link['vacancy_link'] if isinstance(link, dict) else link
+                     for link in vacancy_links)
+    if incremental and state_path is None:
+        raise ValueError('incremental crawl needs state_path')
+    seen = None if state_path is None else SeenIndex('djinni', state_path)
+    search = None if index_path is None else VacancyIndex(index_path)
+    writer = None
+    journal = None
+    completed_links = set()
+    unmarked = []
+    marked_at = time.time()
+
+    def mark_seen(rows):
+        if seen is not None:
+            seen.mark_seen(row['vacancy_link'] for row in rows)
+        if search is not None:
+            search.add(rows)
+
+    if engine is not None:
+        crawl_date = datetime.date.today()
+        if state_path is not None:
+            journal = CrawlJournal(engine, 'djinni_vacancies', crawl_date, state_path)
+            if not resume:
+                journal.clear()
+            completed_links = journal.recover()
+        writer = BufferedWriter(engine, 'djinni_vacancies', batch_size=batch_size,
+                                flush_interval=flush_interval, on_flush=mark_seen,
+                                entry_point='djinni.get_vacancies', journal=journal,
+                                save=partial(upsert, crawl_date=crawl_date))
+    vacancy_links = (url for url in vacancy_links if url not in completed_links)
+    if incremental:
+        vacancy_links = (url for url in vacancy_links if not seen.known([url]))
+    try:
+        with ParsePool(processes) as pool:
+            def parse(url, content):
+                return pool.submit(parse_vacancy_page, url, content, site_link)
+
+            for url, data in fetch_pages(vacancy_links, workers=workers,
+                                         entry_point='djinni.get_vacancies', transform=parse):
+                if data['position'] is None:
+                    if writer is not None:
+                        writer.write_many([], unit=url)
+                    continue
+                if writer is not None:
+                    writer.write(data, unit=url)
+                yield data
+                if writer is None and (seen is not None or search is not None):
+                    unmarked.append(data)
+                    if len(unmarked) >= batch_size or \
+                            time.time() - marked_at >= flush_interval:
+                        mark_seen(unmarked)
+                        unmarked, marked_at = [], time.time()
+    finally:
+        if writer is not None:
+            writer.flush()
+        if unmarked:
+            mark_seen(unmarked)
+
+
+def get_vacancies(vacancy_links_df, workers=8, batch_size=1000, flush_interval=30,
+                  incremental=False, engine=None, site_link=SITE_LINK, resume=True, processes=0,
+                  state_path='crawl_state.sqlite3', index_path='vacancy_index.sqlite3'):
     """
     get_vacancies is function to parse djinni.co site.
     For every vacancy link, it gets information about vacancies from the site.
-    It saves information about vacancies in SQL database. It looks like:
+    It saves information about vacancies in SQL database (djinni_vacancies table,
+    see storage.py). It looks like:
     - vacancy_link          Example: 'https://djinni.co/jobs/52072-python-cloud-developer-kyiv-/'
     - position              Example: 'Python Cloud Developer'
     - specialization        Example: 'Python'
@@ -90,104 +319,42 @@ def get_vacancies(vacancy_links_df):
     - recruiter             Example: 'Tetiana Krevska'
     - recruiter_company     Example: 'Recruitment Consultant at Ciklum'
     - recruiter_link        Example: 'https://djinni.co/r/35698-recruitment-consultant-at-ciklum/'
-    - descriptions          Example: 'Responsibilities Developing and automating production ...'
-    - about_company         Example: 'Ciklum is a global software engineering and technology ...'
-    - index                 Example: '"184"'
+    - descriptions_digest   sha256 of descriptions ('Responsibilities Developing and ...')
+    - about_company_digest  sha256 of about_company ('Ciklum is a global software ...')
+    The texts are saved once per content in vacancy_texts table
+    (see storage.read_entity(engine, 'djinni_vacancies', texts=True)).
 
     :param vacancy_links_df: pandas.DataFrame that has vacancy links
+                             (or any iterable that iter_vacancies takes)
+    :param workers: number of vacancy pages that are downloaded at the same time
+    :param batch_size: number of vacancies that are saved into database at once
+    :param flush_interval: number of seconds after which parsed vacancies are saved
+                           when the next one is parsed (see sink.BufferedWriter)
+    :param incremental: if True, vacancies that were already scraped are skipped
+    :param engine: a sqlalchemy engine (connect_to_database() asks for connection data if None)
+    :param site_link: djinni.co address
+    :param resume: if True, vacancies that were saved by an interrupted run of the same day
+                   are not downloaded again (see crawl_state.CrawlJournal),
+                   if False, all vacancy links are downloaded
+    :param processes: number of processes that parse pages (see pipeline.ParsePool),
+                      0 means pages are parsed by the downloading threads
+    :param state_path: path to the SQLite file with crawl state or None (see iter_vacancies)
+    :param index_path: path to the SQLite file with the full-text index or None
+                       (see iter_vacancies)
     :return: pandas.DataFrame that has information about vacancies
     """
     import datetime
 
-    import pandas as pd
-    import requests
-    from bs4 import BeautifulSoup
-
-    def convert_date(temp):
-        """
-        convert_date is a function to convert date from string to datetime.date format
-        :param temp: list of information about date
-        :return: datetime.date
-        """
-
-        month = int(temp[1].replace('января', '1').replace('февраля', '2').replace('марта', '3')\
-                    .replace('апреля', '4').replace('мая', '5').replace('июня', '6')\
-                    .replace('июля', '7').replace('августа', '8').replace('сентября', '9')\
-                    .replace('октября', '10').replace('ноября', '11').replace('декабря', '12'))
-        day = int(temp[0])
-        year = int(temp[2])
-        return datetime.date(year, month, day)
-
-    site_link = 'https://djinni.co'
-    ind = 0
+    from storage import read_entity
+
     all_time = datetime.datetime.now()
-    engine = connect_to_database()
-    for url in vacancy_links_df.vacancy_link:
-        start = datetime.datetime.now()
-        response = requests.get(url)
-        results_page = BeautifulSoup(response.content, 'lxml')
-        ind += 1
-        position = results_page.find("div", class_="page-header").find("h1") \
-            .get_text().replace("\n", "").replace("  ", "")
-        specialization = results_page.find("div", class_="page-header")\
-            .find_all("li")[1].get_text().replace("\n", "")
-        try:
-            city = results_page.find("div", class_="page-header")\
-                .find_all("li")[2].get_text().replace("\n", "")
-        except IndexError:
-            city = specialization
-            specialization = None
-        try:
-            title = results_page.find("p", class_="profile").get_text()
-        except AttributeError:
-            title = None
-        try:
-            tmp_date = results_page.find("div", class_="profile-page-section text-small")\
-                           .get_text()\
-                           .replace("\n", "")\
-                           .replace(".", "")\
-                           .split(" ")[26:29]
-            published_date = convert_date(tmp_date)
-        except AttributeError:
-            published_date = None
-        recruiter = results_page.find("img", class_="list-jobs__userpic back-recruiter-image")\
-            .get('alt')
-        tmp_recr_comp = results_page.find("div", class_="list-jobs__details")\
-            .get_text()\
-            .replace("\n", "")\
-            .replace("\xa0", "")\
-            .split("   ")
-        if tmp_recr_comp[0] == "":
-            recruiter_company = tmp_recr_comp[8]
-        else:
-            recruiter_company = tmp_recr_comp[2]
-        tmp_recr_link = results_page.find("div", class_="list-jobs__details").find("a").get("href")
-        recruiter_link = f'{site_link}{tmp_recr_link}'
-        tmp_descritions = results_page.find_all("div", class_="profile-page-section")
-        descriptions = tmp_descritions[1].get_text().replace("\n", " ")
-        try:
-            about_company = tmp_descritions[2].get_text().replace("\n", " ")
-            if 'Вакансия опубликована' in about_company:
-                about_company = None
-        except IndexError:
-            about_company = None
-
-        data = {"vacancy_link": url, "position": position,
-                "specialization": specialization, "city": city,
-                "title": title, "published_date": published_date,
-                "recruiter": recruiter, "recruiter_company": recruiter_company,
-                "recruiter_link": recruiter_link, "descriptions": descriptions,
-                "about_company": about_company, 'index': ind}
-
-        if data['position'] == "":
-            continue
-        temp_result = pd.DataFrame(data, index=[0])
-        temp_result.set_index('index')
-        temp_result.to_sql(f'djinni_{datetime.date.today()}', engine, if_exists='append')
-        print(ind, url, datetime.datetime.now() - start)
-
-    query = f'SELECT vacancy_link FROM public."djinni_{datetime.date.today()}";'
-    vacancies = pd.read_sql(query, engine)
+    crawl_date = datetime.date.today()
+    if engine is None:
+        engine = connect_to_database()
+    for _ in iter_vacancies(vacancy_links_df, workers, batch_size, flush_interval, incremental,
+                            engine, site_link, resume, processes, state_path, index_path):
+        pass
+    vacancies = read_entity(engine, 'djinni_vacancies', crawl_date)[['vacancy_link']]
     del engine
     print(datetime.datetime.now() - all_time)
     return vacancies
@@ -0,0 +1,156 @@
+"""
+It is a module that has extraction specs for djinni.co and work.ua pages.
+Every spec is a dict field -> XPath that is compiled once with lxml
+and applied to a page with one parse of the document:
+
+- 'xpath'                   the first value or None
+- ('all', 'xpath')          list of all values
+- {'rows': 'xpath',
+   'fields': {...}}         list of dicts, fields are evaluated relative to every row
+
+Elements are converted to their text with normalized whitespace, empty strings become None.
+"""
+import datetime
+import re
+
+from lxml import etree
+
+_parser = etree.HTMLParser()
+
+MONTHS = {'января': 1, 'февраля': 2, 'марта': 3, 'апреля': 4, 'мая': 5, 'июня': 6,
+          'июля': 7, 'августа': 8, 'сентября': 9, 'октября': 10, 'ноября': 11, 'декабря': 12,
+          'січня': 1, 'лютого': 2, 'березня': 3, 'квітня': 4, 'травня': 5, 'червня': 6,
+          'липня': 7, 'серпня': 8, 'вересня': 9, 'жовтня': 10, 'листопада': 11, 'грудня': 12}
+
+_date_pattern = re.compile(r'(\d{1,2})\s+(%s)\s+(\d{4})' % '|'.join(MONTHS))
+
+
+def has_class(name):
+    """
+    has_class is a function that returns XPath condition "element has class name"
+    (like BeautifulSoup class_="name").
+
+    :param name: example: 'page-header'
+    :return: XPath condition
+    """
+    return f'contains(concat(" ", normalize-space(@class), " "), " {name} ")'
+
+
+def compile_spec(spec):
+    """
+    compile_spec is a function that compiles all XPath expressions of a spec.
+
+    :param spec: dict field -> XPath (see module docstring)
+    :return: compiled spec
+    """
+    compiled = {}
+    for field, rule in spec.items():
+        if isinstance(rule, dict):
+            compiled[field] = ('rows', etree.XPath(rule['rows']), compile_spec(rule['fields']))
+        elif isinstance(rule, tuple):
+            compiled[field] = ('all', etree.XPath(rule[1]), None)
+        else:
+            compiled[field] = ('first', etree.XPath(rule), None)
+    return compiled
+
+
+def _value(item):
+    if isinstance(item, etree._Element):
+        item = item.xpath('string()')
+    if isinstance(item, str):
+        item = ' '.join(item.split())
+    if item == '':
+        return None
+    return item
+
+
+def _apply(compiled, node):
+    data = {}
+    for field, (kind, xpath, fields) in compiled.items():
+        result = xpath(node)
+        if kind == 'rows':
+            data[field] = [_apply(fields, row) for row in result]
+        elif not isinstance(result, list):
+            data[field] = _value(result)
+        elif kind == 'all':
+            data[field] = [_value(item) for item in result]
+        else:
+            data[field] = _value(result[0]) if result else None
+    return data
+
+
+def extract(compiled, content):
+    """
+    extract is a function that parses a page once and applies a compiled spec to it.
+
+    :param compiled: spec compiled with compile_spec
+    :param content: raw page content (bytes or str)
+    :return: dict field -> value
+    """
+    tree = etree.fromstring(content, _parser) if content else None
+    if tree is None:
+        tree = etree.fromstring('<html></html>', _parser)
+    return _apply(compiled, tree)
+
+
+def parse_date(text):
+    """
+    parse_date is a function that finds date like '22 февраля 2019' or '22 лютого 2019' in text.
+
+    :param text: text with a date
+    :return: datetime.date or None
+    """
+    if text is None:
+        return None
+    match = _date_pattern.search(text)
+    if match is None:
+        return None
+    return datetime.date(int(match.group(3)), MONTHS[match.group(2)], int(match.group(1)))
+
+
+DJINNI_LISTING = compile_spec({
+    'numbers_of_vacancies': f'(//small[{has_class("text-muted")}])[1]',
+    'vacancy_links': ('all', f'//li[{has_class("list-jobs__item")}][div]'
+                             f'/descendant::a[{has_class("profile")}][1]/@href'),
+})
+
+DJINNI_VACANCY = compile_spec({
+    'position': f'(//div[{has_class("page-header")}])[1]//h1',
+    'header_items': ('all', f'(//div[{has_class("page-header")}])[1]//li'),
+    'title': f'//p[{has_class("profile")}]',
+    'published': '//div[@class="profile-page-section text-small"]',
+    'recruiter': '//img[@class="list-jobs__userpic back-recruiter-image"]/@alt',
+    'recruiter_company': f'(//div[{has_class("list-jobs__details")}])[1]'
+                         f'//text()[normalize-space(translate(., "\u00a0", " "))][not(ancestor::a)]',
+    'recruiter_link': f'((//div[{has_class("list-jobs__details")}])[1]//a)[1]/@href',
+    'sections': ('all', f'//div[{has_class("profile-page-section")}]'),
+})
+
+WORK_UA_LISTING = compile_spec({
+    'first_bold': '(//b)[1]',
+    'total': '(//b[starts-with(normalize-space(), "Знайдено")])[1]',
+    'cards': {
+        'rows': '//div[@class="card card-hover card-visited wordwrap job-link js-hot-block"'
+                ' or @class="card card-hover card-visited wordwrap job-link"]',
+        'fields': {
+            'link': '(.//a)[1]/@href',
+            'link_title': '(.//a)[1]/@title',
+            'classes': '@class',
+            'company_title': '(.//b)[1]',
+            'salary': f'(.//span[{has_class("nowrap")}])[1]',
+        },
+    },
+})
+
+WORK_UA_CITY = compile_spec({
+    'city_page': 'boolean(//h1[@id="cityPage"])',
+    'city_link': '//meta[@property="og:url"]/@content',
+    'city_name': '//input[@id="city"]/@value',
+})
+
+WORK_UA_CATEGORIES = compile_spec({
+    'category_names': ('all', '//a[@class="filter-link catlink"]'),
+    'category_links': ('all', '//a[@class="filter-link catlink"]/@href'),
+    'category_values': ('all', '(//div[@id="category_selection"])[1]'
+                               '//input[@type="checkbox"]/@value'),
+})
@@ -0,0 +1,249 @@
+"""
+It is a module that has functions to download pages from djinni.co and work.ua sites concurrently.
+Every request waits for its host controller (see rate_control.HostController), has a timeout
+and is retried with jittered exponential backoff after 429/5xx responses and network errors.
+"""
+import datetime
+import email.utils
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from urllib.parse import urlsplit
+
+import requests
+
+from metrics import REGISTRY
+from rate_control import HostController
+
+HOST_CONCURRENCY = 8
+TIMEOUT = (10, 30)
+ATTEMPTS = 5
+BACKOFF = 0.5
+MAX_BACKOFF = 30
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+RETRY_ERRORS = (requests.ConnectionError, requests.Timeout,
+                requests.exceptions.ChunkedEncodingError, requests.exceptions.ContentDecodingError)
+
+_local = threading.local()
+_host_controllers = {}
+_host_controllers_lock = threading.Lock()
+_cache_settings = {'cache': None, 'offline': False, 'as_of': None}
+
+
+def get_session(url):
+    """
+    get_session is a function that returns a keep-alive requests.Session for the host of url.
+    Every worker thread has its own session per host, so connections are reused
+    between requests without sharing a session across threads.
+
+    :param url: example: 'https://djinni.co/jobs/?page=1'
+    :return: requests.Session
+    """
+    sessions = getattr(_local, 'sessions', None)
+    if sessions is None:
+        sessions = _local.sessions = {}
+    host = urlsplit(url).netloc
+    if host not in sessions:
+        sessions[host] = requests.Session()
+    return sessions[host]
+
+
+def set_host_concurrency(host, limit, **settings):
+    """
+    set_host_concurrency is a function that sets the max number of requests to one host
+    that can be in flight at the same time from all threads (HOST_CONCURRENCY by default).
+    The controller lowers it while the host is slow or returns errors.
+    It must be called before the first request to the host.
+
+    :param host: example: 'www.work.ua'
+    :param limit: max number of concurrent requests
+    :param settings: other arguments of rate_control.HostController. Example: max_rate=5
+    :return: None
+    """
+    with _host_controllers_lock:
+        _host_controllers[host] = HostController(host, max_concurrency=limit, **settings)
+
+
+def host_controller(url):
+    """
+    host_controller is a function that returns the controller of requests to the host of url.
+
+    :param url: example: 'https://www.work.ua/jobs-kyiv-it/'
+    :return: rate_control.HostController
+    """
+    host = urlsplit(url).netloc
+    with _host_controllers_lock:
+        if host not in _host_controllers:
+            _host_controllers[host] = HostController(host, max_concurrency=HOST_CONCURRENCY)
+        return _host_controllers[host]
+
+
+def retry_after(response):
+    """
+    retry_after is a function that returns how long a response asks to wait (Retry-After).
+
+    :param response: requests.Response
+    :return: seconds or None
+    """
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    if value.strip().isdigit():
+        return float(value)
+    try:
+        moment = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (moment - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+
+def backoff(attempt):
+    """
+    backoff is a function that returns a random pause before a retry (full jitter).
+
+    :param attempt: number of failed attempts (from 1)
+    :return: seconds
+    """
+    return random.uniform(0, min(MAX_BACKOFF, BACKOFF * 2 ** attempt))
+
+
+def _request(url, headers, entry_point):
+    controller = host_controller(url)
+    for attempt in range(1, ATTEMPTS + 1):
+        wait_seconds = None
+        try:
+            with controller, REGISTRY.timed('fetch', entry_point):
+                start = time.perf_counter()
+                response = get_session(url).get(url, headers=headers, timeout=TIMEOUT)
+                content = response.content
+        except RETRY_ERRORS:
+            controller.failure()
+            REGISTRY.inc('fetch_errors_total', entry_point=entry_point)
+            if attempt == ATTEMPTS:
+                raise
+        except requests.RequestException:
+            REGISTRY.inc('fetch_errors_total', entry_point=entry_point)
+            raise
+        else:
+            if response.status_code not in RETRY_STATUSES:
+                controller.success(time.perf_counter() - start)
+                return response, content
+            wait_seconds = retry_after(response)
+            controller.failure(wait_seconds, throttled=response.status_code == 429)
+            REGISTRY.inc('fetch_errors_total', entry_point=entry_point)
+            if attempt == ATTEMPTS:
+                response.raise_for_status()
+        REGISTRY.inc('fetch_retries_total', entry_point=entry_point)
+        time.sleep(max(wait_seconds or 0, backoff(attempt)))
+
+
+def use_cache(cache, offline=False, as_of=None):
+    """
+    use_cache is a function that makes fetch save responses into a cache.
+    A page that is in the cache is requested with If-None-Match/If-Modified-Since,
+    and the saved body is used if the site answers 304 Not Modified.
+    In offline mode pages are only read from the cache (see http_cache.CacheMiss),
+    so parsed tables can be rebuilt from saved pages without the network.
+
+    :param cache: http_cache.ResponseCache or None to stop using a cache
+    :param offline: if True, the network is not used
+    :param as_of: datetime.datetime, offline mode reads pages saved before it
+                  (None means the last saved ones)
+    :return: None
+    """
+    _cache_settings.update(cache=cache, offline=offline, as_of=as_of)
+
+
+def fetch(url, entry_point='unknown'):
+    """
+    fetch is a function that downloads one page using a keep-alive session.
+    It waits for the host controller (see host_controller) first, and retries 429/5xx
+    responses, timeouts, connection errors and cut off bodies (RETRY_ERRORS) ATTEMPTS times.
+    If a cache is used (see use_cache), the page is revalidated or read from it
+    (a saved response whose body was evicted is a cache miss).
+    Its time, size and errors are recorded in metrics.REGISTRY.
+
+    :param url: page url
+    :param entry_point: entry point for metrics. Example: 'djinni.get_vacancies'
+    :return: raw page content (bytes)
+    """
+    cache = _cache_settings['cache']
+    cached = None
+    headers = {}
+    if cache is not None:
+        if _cache_settings['offline']:
+            cached = cache.lookup(url, as_of=_cache_settings['as_of'], fresh=False)
+            content = None if cached is None else cache.read(cached)
+            if content is None:
+                from http_cache import CacheMiss
+
+                raise CacheMiss(url)
+            REGISTRY.inc('cache_hits_total', entry_point=entry_point)
+            return content
+        cached = cache.lookup(url)
+        if cached is not None and cached['etag']:
+            headers['If-None-Match'] = cached['etag']
+        if cached is not None and cached['last_modified']:
+            headers['If-Modified-Since'] = cached['last_modified']
+    response, content = _request(url, headers, entry_point)
+    if cache is not None and response.status_code == 304 and cached is not None:
+        body = cache.read(cached)
+        if body is not None:
+            REGISTRY.inc('fetch_bytes_total', len(content), entry_point=entry_point)
+            REGISTRY.inc('cache_hits_total', entry_point=entry_point)
+            cache.revalidated(cached)
+            return body
+        # the body was evicted after lookup, the page is downloaded again
+        response, content = _request(url, {}, entry_point)
+    REGISTRY.inc('fetch_bytes_total', len(content), entry_point=entry_point)
+    if cache is not None and response.status_code == 200:
+        cache.store(url, content, response.headers.get('ETag'),
+                    response.headers.get('Last-Modified'))
+    return content
+
+
+def _fetch_and_transform(url, entry_point, transform):
+    content = fetch(url, entry_point)
+    return content if transform is None else transform(url, content)
+
+
+def fetch_pages(urls, workers=8, entry_point='unknown', transform=None):
+    """
+    fetch_pages is a function that downloads pages concurrently and yields them as they arrive.
+    urls is consumed lazily: no more than workers * 2 pages are in flight,
+    so it can be a generator that is still producing links.
+
+    :param urls: iterable of page urls
+    :param workers: number of concurrent requests (1 means one request at a time)
+    :param entry_point: entry point for metrics. Example: 'djinni.get_vacancies'
+    :param transform: function(url, content) that is called in the downloading thread,
+                      its result is yielded instead of content. If it returns
+                      a concurrent.futures.Future (see pipeline.ParsePool.submit), the thread
+                      goes back to downloading and the result of the future is yielded;
+                      the page counts in the pages in flight until the future is done
+    :return: generator of (url, content) tuples in order of completion
+    """
+    urls = iter(urls)
+
+    def submit(executor):
+        for url in urls:
+            pending[executor.submit(_fetch_and_transform, url, entry_point, transform)] = url
+            return True
+        return False
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+        while len(pending) < workers * 2 and submit(executor):
+            pass
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                url = pending.pop(future)
+                result = future.result()
+                if isinstance(result, Future):
+                    pending[result] = url
+                    continue
+                yield url, result
+            while len(pending) < workers * 2 and submit(executor):
+                pass
@@ -0,0 +1,144 @@
+"""
+It is a module that has a spatial index over work.ua cities to find vacancies near a place.
+
+    from storage import read_entity
+
+    cities = read_entity(engine, 'work_ua_cities', datetime.date(2019, 2, 22))
+    vacancies = read_entity(engine, 'work_ua_vacancies', datetime.date(2019, 2, 22))
+    index = CityIndex(cities)
+    index.vacancies_within(vacancies, *index.coordinates('kyiv'), radius_km=50)
+"""
+import numpy as np
+import pandas as pd
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine(latitude, longitude, latitudes, longitudes):
+    """
+    haversine is a function that returns great-circle distances from one point to many points.
+
+    :param latitude: latitude of the point (degrees)
+    :param longitude: longitude of the point (degrees)
+    :param latitudes: numpy.ndarray of latitudes (degrees)
+    :param longitudes: numpy.ndarray of longitudes (degrees)
+    :return: numpy.ndarray of distances in km
+    """
+    latitude, longitude = np.radians(latitude), np.radians(longitude)
+    latitudes, longitudes = np.radians(latitudes), np.radians(longitudes)
+    a = np.sin((latitudes - latitude) / 2) ** 2 + \
+        np.cos(latitude) * np.cos(latitudes) * np.sin((longitudes - longitude) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class CityIndex:
+    """
+    CityIndex is a class that puts cities into a grid of cell_degrees x cell_degrees cells.
+    A radius query only computes distances to cities from the cells that cover the circle.
+
+    :param cities: pandas.DataFrame with city_lat_name, city_latitude and city_longitude
+                   (cities without coordinates are skipped)
+    :param cell_degrees: size of a grid cell in degrees
+    """
+
+    def __init__(self, cities, cell_degrees=0.5):
+        cities = cities.dropna(subset=['city_latitude', 'city_longitude'])
+        cities = cities.drop_duplicates('city_lat_name')
+        self.names = cities.city_lat_name.values
+        self.latitudes = cities.city_latitude.values.astype(float)
+        self.longitudes = cities.city_longitude.values.astype(float)
+        self.cell_degrees = cell_degrees
+        rows = np.floor(self.latitudes / cell_degrees).astype(int)
+        columns = np.floor(self.longitudes / cell_degrees).astype(int)
+        self.cells = {}
+        for position, cell in enumerate(zip(rows, columns)):
+            self.cells.setdefault(cell, []).append(position)
+        self.cells = {cell: np.array(positions) for cell, positions in self.cells.items()}
+
+    def coordinates(self, city_lat_name):
+        """
+        coordinates is a method that returns coordinates of a city.
+
+        :param city_lat_name: example: 'kyiv'
+        :return: (latitude, longitude)
+        """
+        position = np.flatnonzero(self.names == city_lat_name)
+        if not len(position):
+            raise KeyError(city_lat_name)
+        return self.latitudes[position[0]], self.longitudes[position[0]]
+
+    def _candidates(self, latitude, longitude, radius_km):
+        latitude_delta = np.degrees(radius_km / EARTH_RADIUS_KM)
+        cos_latitude = max(np.cos(np.radians(min(abs(latitude) + latitude_delta, 89.0))), 1e-6)
+        longitude_delta = min(latitude_delta / cos_latitude, 180.0)
+        first_row = int(np.floor((latitude - latitude_delta) / self.cell_degrees))
+        last_row = int(np.floor((latitude + latitude_delta) / self.cell_degrees))
+        columns = set()
+        # a circle near the 180th meridian also covers cells on its other side
+        for shift in (-360.0, 0.0, 360.0):
+            west, east = longitude - longitude_delta + shift, longitude + longitude_delta + shift
+            if west <= 180.0 and east >= -180.0:
+                columns.update(range(int(np.floor(west / self.cell_degrees)),
+                                     int(np.floor(east / self.cell_degrees)) + 1))
+        if (last_row - first_row + 1) * len(columns) > len(self.cells):
+            return np.arange(len(self.names))
+        positions = [self.cells[(row, column)]
+                     for row in range(first_row, last_row + 1)
+                     for column in columns
+                     if (row, column) in self.cells]
+        if not positions:
+            return np.array([], dtype=int)
+        return np.concatenate(positions)
+
+    def within(self, latitude, longitude, radius_km):
+        """
+        within is a method that returns cities within radius_km from a point.
+
+        :param latitude: latitude of the point
+        :param longitude: longitude of the point
+        :param radius_km: radius in km
+        :return: pandas.DataFrame with city_lat_name and distance_km sorted by distance
+        """
+        positions = self._candidates(latitude, longitude, radius_km)
+        distances = haversine(latitude, longitude,
+                              self.latitudes[positions], self.longitudes[positions])
+        inside = distances <= radius_km
+        result = pd.DataFrame({'city_lat_name': self.names[positions][inside],
+                               'distance_km': distances[inside]})
+        return result.sort_values('distance_km').reset_index(drop=True)
+
+    def nearest(self, latitude, longitude, k=5):
+        """
+        nearest is a method that returns k cities nearest to a point.
+
+        :param latitude: latitude of the point
+        :param longitude: longitude of the point
+        :param k: number of cities
+        :return: pandas.DataFrame with city_lat_name and distance_km sorted by distance
+        """
+        k = min(k, len(self.names))
+        radius_km = self.cell_degrees * 111.0
+        result = self.within(latitude, longitude, radius_km)
+        while len(result) < k:
+            radius_km *= 2
+            result = self.within(latitude, longitude, radius_km)
+        return result.head(k)
+
+    def vacancies_within(self, vacancies, latitude, longitude, radius_km,
+                         city_column='vacancy_city'):
+        """
+        vacancies_within is a method that returns vacancies from cities within radius_km
+        from a point.
+
+        :param vacancies: pandas.DataFrame with vacancies (see work_ua_vacancies.get_vacancies)
+        :param latitude: latitude of the point
+        :param longitude: longitude of the point
+        :param radius_km: radius in km
+        :param city_column: column of vacancies with city_lat_name
+        :return: pandas.DataFrame with vacancies and distance_km column
+        """
+        cities = self.within(latitude, longitude, radius_km)
+        distances = pd.Series(cities.distance_km.values, index=cities.city_lat_name.values)
+        result = vacancies[vacancies[city_column].isin(distances.index)].copy()
+        result['distance_km'] = result[city_column].map(distances)
+        return result
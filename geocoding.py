@@ -0,0 +1,63 @@
+"""
+It is a module that has functions to find coordinates of work.ua cities.
+"""
+
+
+def geocode_cities(cities, min_delay_seconds=1, entry_point='work_ua.get_cities'):
+    """
+    geocode_cities is a function that adds city_latitude and city_longitude to every city.
+    Coordinates are taken from the local geocode cache. Cities that are not in the cache
+    are looked up once per city_lat_name through one rate-limited Nominatim geocoder
+    (first by city_lat_name, then by city_name) and the results are cached,
+    including cities that were not found. Cities that failed with a geocoder error
+    get None coordinates and are not cached.
+    Geocoder requests (stage 'geocode'), cities that were not found and geocoder errors
+    are recorded in metrics.REGISTRY.
+
+    :param cities: list of dicts with city_name and city_lat_name
+    :param min_delay_seconds: min delay between two geocoder requests
+    :param entry_point: entry point for metrics. Example: 'work_ua.get_cities'
+    :return: the same list of dicts
+    """
+    from geopy.exc import GeopyError
+    from geopy.extra.rate_limiter import RateLimiter
+    from geopy.geocoders import Nominatim
+    from crawl_state import GeocodeCache
+    from metrics import REGISTRY
+
+    cache = GeocodeCache()
+    points = cache.get(city['city_lat_name'] for city in cities)
+    misses = {}
+    for city in cities:
+        if city['city_lat_name'] not in points:
+            misses.setdefault(city['city_lat_name'], city['city_name'])
+
+    if misses:
+        geolocator = Nominatim(user_agent='VacanciesParser')
+        limited = RateLimiter(geolocator.geocode, min_delay_seconds=min_delay_seconds,
+                              swallow_exceptions=False)
+
+        def geocode(query):
+            REGISTRY.inc('geocode_requests_total', entry_point=entry_point)
+            with REGISTRY.timed('geocode', entry_point):
+                return limited(query, timeout=10)
+
+        for city_lat_name, city_name in misses.items():
+            try:
+                location = geocode(city_lat_name.replace("_", " "))
+                if location is None:
+                    location = geocode(city_name)
+            except GeopyError:
+                REGISTRY.inc('geocode_errors_total', entry_point=entry_point)
+                points[city_lat_name] = (None, None)
+                continue
+            if location is None:
+                REGISTRY.inc('geocode_misses_total', entry_point=entry_point)
+                points[city_lat_name] = (None, None)
+            else:
+                points[city_lat_name] = (location.latitude, location.longitude)
+            cache.put(city_lat_name, *points[city_lat_name])
+
+    for city in cities:
+        city['city_latitude'], city['city_longitude'] = points[city['city_lat_name']]
+    return cities
@@ -0,0 +1,204 @@
+"""
+It is a module that has an on-disk cache of raw responses of djinni.co and work.ua.
+Bodies are compressed with zlib and stored once per content (file name is sha256 of the body),
+an index in SQLite keeps every (url, fetch time) -> body, ETag and Last-Modified.
+
+    from fetching import use_cache
+    from http_cache import ResponseCache
+
+    use_cache(ResponseCache())                  # crawl, save responses, revalidate cached pages
+    work_ua_vacancies.get_vacancies(['kyiv'], ['it'])
+
+    use_cache(ResponseCache(), offline=True)    # rebuild tables from saved pages, no network
+    work_ua_vacancies.get_vacancies(['kyiv'], ['it'], resume=False)
+"""
+import datetime
+import hashlib
+import os
+import sqlite3
+import threading
+import zlib
+
+CACHE_DIRECTORY = 'http_cache'
+PURGE_INTERVAL = datetime.timedelta(hours=1)
+
+
+class CacheMiss(LookupError):
+    """
+    CacheMiss is an exception that is raised when an offline fetch asks for a url
+    that is not in the cache.
+    """
+
+
+class ResponseCache:
+    """
+    ResponseCache is a class that saves raw responses on disk.
+    Entries older than ttl are removed when the cache is opened and then every
+    PURGE_INTERVAL while responses are stored, and the oldest entries are removed when
+    compressed bodies take more than max_bytes.
+
+    :param directory: cache directory
+    :param ttl: datetime.timedelta, how long a response is kept
+    :param max_bytes: max size of compressed bodies
+    """
+
+    def __init__(self, directory=CACHE_DIRECTORY, ttl=datetime.timedelta(days=30),
+                 max_bytes=2 ** 30):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(os.path.join(directory, 'index.sqlite3'),
+                                          check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS responses ('
+                                'url TEXT NOT NULL, '
+                                'fetched_at TEXT NOT NULL, '
+                                'digest TEXT NOT NULL, '
+                                'etag TEXT, '
+                                'last_modified TEXT, '
+                                'PRIMARY KEY (url, fetched_at))')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS responses_digest '
+                                'ON responses (digest)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS bodies ('
+                                'digest TEXT PRIMARY KEY, '
+                                'size INTEGER NOT NULL)')
+        self.connection.commit()
+        self.stored_bytes = self.connection.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM bodies').fetchone()[0]
+        self.evict()
+
+    def _path(self, digest):
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def lookup(self, url, as_of=None, fresh=True):
+        """
+        lookup is a method that returns the last saved response of a url.
+
+        :param url: page url
+        :param as_of: datetime.datetime, the last response fetched before it is returned
+                      (None means the last one)
+        :param fresh: if True, responses older than ttl are not returned
+        :return: dict with url, fetched_at, digest, etag and last_modified or None
+        """
+        now = datetime.datetime.now()
+        as_of = (as_of or now).isoformat(sep=' ')
+        oldest = (now - self.ttl).isoformat(sep=' ') if fresh else ''
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT url, fetched_at, digest, etag, last_modified FROM responses '
+                'WHERE url = ? AND fetched_at <= ? AND fetched_at >= ? '
+                'ORDER BY fetched_at DESC LIMIT 1', (url, as_of, oldest)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('url', 'fetched_at', 'digest', 'etag', 'last_modified'), row))
+
+    def read(self, entry):
+        """
+        read is a method that returns the body of a saved response.
+
+        :param entry: dict returned by lookup
+        :return: bytes or None if the body was removed (it is a cache miss)
+        """
+        try:
+            with open(self._path(entry['digest']), 'rb') as file:
+                return zlib.decompress(file.read())
+        except FileNotFoundError:
+            return None
+
+    def store(self, url, content, etag=None, last_modified=None):
+        """
+        store is a method that saves a response. The body is written only if
+        the same content is not saved yet. The body and the response are added
+        in one transaction under the lock, so evict does not see the body without
+        its response and remove it.
+
+        :param url: page url
+        :param content: bytes
+        :param etag: ETag header of the response
+        :param last_modified: Last-Modified header of the response
+        :return: None
+        """
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._path(digest)
+        compressed = None if os.path.exists(path) else zlib.compress(content, 6)
+        now = datetime.datetime.now().isoformat(sep=' ')
+        with self.lock:
+            if not os.path.exists(path):
+                if compressed is None:
+                    # it was removed by evict after the check above
+                    compressed = zlib.compress(content, 6)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                temporary = f'{path}.{threading.get_ident()}.tmp'
+                with open(temporary, 'wb') as file:
+                    file.write(compressed)
+                os.replace(temporary, path)
+            if compressed is not None:
+                cursor = self.connection.execute('INSERT OR IGNORE INTO bodies VALUES (?, ?)',
+                                                 (digest, len(compressed)))
+                self.stored_bytes += len(compressed) if cursor.rowcount else 0
+            self.connection.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)',
+                                    (url, now, digest, etag, last_modified))
+            self.connection.commit()
+        if self.stored_bytes > self.max_bytes or \
+                datetime.datetime.now() - self.purged_at > PURGE_INTERVAL:
+            self.evict()
+
+    def revalidated(self, entry):
+        """
+        revalidated is a method that saves a new fetch time for a response
+        that the site answered with 304 Not Modified.
+
+        :param entry: dict returned by lookup
+        :return: None
+        """
+        now = datetime.datetime.now().isoformat(sep=' ')
+        with self.lock:
+            self.connection.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)',
+                                    (entry['url'], now, entry['digest'], entry['etag'],
+                                     entry['last_modified']))
+            self.connection.commit()
+
+    def evict(self):
+        """
+        evict is a method that removes responses older than ttl and then the oldest responses
+        until compressed bodies take no more than max_bytes (90% of it, so eviction
+        does not run on every store).
+
+        :return: number of removed bodies
+        """
+        self.purged_at = datetime.datetime.now()
+        oldest = (self.purged_at - self.ttl).isoformat(sep=' ')
+        with self.lock:
+            self.connection.execute('DELETE FROM responses WHERE fetched_at < ?', (oldest,))
+            removed = self._remove_orphans()
+            if self.stored_bytes > self.max_bytes:
+                rows = self.connection.execute(
+                    'SELECT r.digest, MAX(r.fetched_at) AS used, b.size FROM responses r '
+                    'JOIN bodies b ON b.digest = r.digest GROUP BY r.digest ORDER BY used')
+                excess = self.stored_bytes - self.max_bytes * 0.9
+                digests = []
+                for digest, _, size in rows:
+                    if excess <= 0:
+                        break
+                    digests.append((digest,))
+                    excess -= size
+                self.connection.executemany('DELETE FROM responses WHERE digest = ?', digests)
+                removed += self._remove_orphans()
+            self.connection.commit()
+        return removed
+
+    def _remove_orphans(self):
+        orphans = self.connection.execute(
+            'SELECT digest, size FROM bodies '
+            'WHERE digest NOT IN (SELECT digest FROM responses)').fetchall()
+        for digest, size in orphans:
+            try:
+                os.remove(self._path(digest))
+            except FileNotFoundError:
+                pass
+            self.stored_bytes -= size
+        self.connection.executemany('DELETE FROM bodies WHERE digest = ?',
+                                    [(digest,) for digest, _ in orphans])
+        return len(orphans)
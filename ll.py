@@ -1,26 +1,26 @@
 ll = {
       "irpin": {"city_latitude": 50.513975, "city_longitude": 30.208149},
       "dnipro": {"city_latitude": 48.461959, "city_longitude": 34.720177},
-      "slavuta ": {"city_latitude": 50.303046, "city_longitude": 26.824922},
-      "tokmak ": {"city_latitude": 47.2490245, "city_longitude": 35.6679011},
-      "novomoskovsk ": {"city_latitude": 48.638112, "city_longitude": 35.190494},
-      "lyman ": {"city_latitude": 48.985265, "city_longitude": 37.775964},
-      "nikopol ": {"city_latitude": 47.592765, "city_longitude": 34.323221},
-      "uman ": {"city_latitude": 48.763057, "city_longitude": 30.18074},
-      "boyarka ": {"city_latitude": 50.32854, "city_longitude": 30.259617},
-      "oleksandrivka_dn ": {"city_latitude": 48.7077048, "city_longitude": 36.9045828},
-      "oleksandrivka_kr ": {"city_latitude": 48.9529841, "city_longitude": 32.2069313},
-      "isliam-terek ": {"city_latitude": 45.2237229, "city_longitude": 35.1871465},
-      "yany-kapu ": {"city_latitude": 45.9541885, "city_longitude": 33.7744574},
-      "yedy-kuiu ": {"city_latitude": 45.2712537,"city_longitude": 35.8020572},
-      "pervomaisk_lg ": {"city_latitude": 48.5987256, "city_longitude": 38.5314102},
-      "ivanivka_od ": {"city_latitude": 46.9790354, "city_longitude": 30.4468519},
-      "mykolaivka_od ": {"city_latitude": 47.5389756, "city_longitude": 30.4468519},
-      "rokytne_rv ": {"city_latitude": 51.2871955, "city_longitude": 27.1926844},
-      "trostyanets_sm ": {"city_latitude": 50.4718245, "city_longitude": 34.9061697},
-      "yampil_sm ": {"city_latitude": 51.948685, "city_longitude": 33.750493},
-      "semenivka_cn ": {"city_latitude": 52.1728604, "city_longitude": 32.5572066},
-      "mykolaivka_dn ": {"city_latitude": 48.8503794, "city_longitude": 37.7500589},
+      "slavuta": {"city_latitude": 50.303046, "city_longitude": 26.824922},
+      "tokmak": {"city_latitude": 47.2490245, "city_longitude": 35.6679011},
+      "novomoskovsk": {"city_latitude": 48.638112, "city_longitude": 35.190494},
+      "lyman": {"city_latitude": 48.985265, "city_longitude": 37.775964},
+      "nikopol": {"city_latitude": 47.592765, "city_longitude": 34.323221},
+      "uman": {"city_latitude": 48.763057, "city_longitude": 30.18074},
+      "boyarka": {"city_latitude": 50.32854, "city_longitude": 30.259617},
+      "oleksandrivka_dn": {"city_latitude": 48.7077048, "city_longitude": 36.9045828},
+      "oleksandrivka_kr": {"city_latitude": 48.9529841, "city_longitude": 32.2069313},
+      "isliam-terek": {"city_latitude": 45.2237229, "city_longitude": 35.1871465},
+      "yany-kapu": {"city_latitude": 45.9541885, "city_longitude": 33.7744574},
+      "yedy-kuiu": {"city_latitude": 45.2712537,"city_longitude": 35.8020572},
+      "pervomaisk_lg": {"city_latitude": 48.5987256, "city_longitude": 38.5314102},
+      "ivanivka_od": {"city_latitude": 46.9790354, "city_longitude": 30.4468519},
+      "mykolaivka_od": {"city_latitude": 47.5389756, "city_longitude": 30.4468519},
+      "rokytne_rv": {"city_latitude": 51.2871955, "city_longitude": 27.1926844},
+      "trostyanets_sm": {"city_latitude": 50.4718245, "city_longitude": 34.9061697},
+      "yampil_sm": {"city_latitude": 51.948685, "city_longitude": 33.750493},
+      "semenivka_cn": {"city_latitude": 52.1728604, "city_longitude": 32.5572066},
+      "mykolaivka_dn": {"city_latitude": 48.8503794, "city_longitude": 37.7500589},
       "pochaev": {"city_latitude": 50.0059622, "city_longitude": 25.481103},
       "oster": {"city_latitude": 50.8692561, "city_longitude": 30.9194554},
       "bar": {"city_latitude": 48.8361483, "city_longitude": 27.2709967},
@@ -0,0 +1,217 @@
+"""
+It is a module that collects timings and counters of crawls.
+Every entry point records its stages (fetch, parse, normalize, write) into REGISTRY:
+
+    from metrics import REGISTRY
+    work_ua_vacancies.get_vacancies(['kyiv'], ['it'])
+    REGISTRY.export('crawl.json')      # or 'crawl.prom' for Prometheus text format
+
+Metrics:
+- vacancies_parser_stage_seconds        histogram, labels: entry_point, stage
+- vacancies_parser_fetch_bytes_total    counter, labels: entry_point
+- vacancies_parser_fetch_errors_total   counter, labels: entry_point
+- vacancies_parser_rows_written_total   counter, labels: entry_point
+- vacancies_parser_cache_hits_total     counter, labels: entry_point (pages read from http_cache)
+- vacancies_parser_fetch_retries_total  counter, labels: entry_point
+- vacancies_parser_host_rate            gauge, labels: host (requests/sec, see rate_control.py)
+- vacancies_parser_host_concurrency     gauge, labels: host (requests in flight allowed)
+- vacancies_parser_geocode_requests_total  counter, labels: entry_point (geocoder requests)
+- vacancies_parser_geocode_misses_total    counter, labels: entry_point (cities not found)
+- vacancies_parser_geocode_errors_total    counter, labels: entry_point (geocoder errors)
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+PREFIX = 'vacancies_parser_'
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels_text(labels):
+    return ','.join(f'{name}="{value}"' for name, value in labels)
+
+
+class Metrics:
+    """
+    Metrics is a thread-safe registry of latency histograms and counters.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+
+    def observe(self, name, value, **labels):
+        """
+        observe is a method that adds a value to a histogram.
+
+        :param name: histogram name without prefix. Example: 'stage_seconds'
+        :param value: float
+        :param labels: labels of the histogram. Example: stage='fetch'
+        :return: None
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {'buckets': [0] * len(BUCKETS),
+                                                    'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    histogram['buckets'][i] += 1
+                    break
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def inc(self, name, value=1, **labels):
+        """
+        inc is a method that increases a counter.
+
+        :param name: counter name without prefix. Example: 'rows_written_total'
+        :param value: number to add
+        :param labels: labels of the counter
+        :return: None
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        """
+        set is a method that sets a gauge.
+
+        :param name: gauge name without prefix
+        :param value: float
+        :param labels: labels of the gauge
+        :return: None
+        """
+        with self.lock:
+            self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    @contextmanager
+    def timed(self, stage, entry_point):
+        """
+        timed is a context manager that records how long its block took as a stage.
+
+            with REGISTRY.timed('parse', 'djinni.get_vacancies'):
+                ...
+
+        :param stage: 'fetch', 'parse', 'normalize' or 'write'
+        :param entry_point: example: 'djinni.get_vacancies'
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('stage_seconds', time.perf_counter() - start,
+                         entry_point=entry_point, stage=stage)
+
+    def snapshot(self):
+        """
+        snapshot is a method that returns a copy of all collected metrics, for example
+        to send them from a worker process to merge() of the main process.
+
+        :return: tuple of dicts
+        """
+        with self.lock:
+            histograms = {key: {'buckets': list(histogram['buckets']), 'sum': histogram['sum'],
+                                'count': histogram['count']}
+                          for key, histogram in self.histograms.items()}
+            return histograms, dict(self.counters), dict(self.gauges)
+
+    def merge(self, snapshot):
+        """
+        merge is a method that adds metrics returned by snapshot() to this registry.
+
+        :param snapshot: tuple returned by snapshot()
+        :return: None
+        """
+        histograms, counters, gauges = snapshot
+        with self.lock:
+            for key, other in histograms.items():
+                histogram = self.histograms.setdefault(
+                    key, {'buckets': [0] * len(BUCKETS), 'sum': 0.0, 'count': 0})
+                histogram['buckets'] = [a + b for a, b in zip(histogram['buckets'],
+                                                              other['buckets'])]
+                histogram['sum'] += other['sum']
+                histogram['count'] += other['count']
+            for key, value in counters.items():
+                self.counters[key] = self.counters.get(key, 0) + value
+            self.gauges.update(gauges)
+
+    def reset(self):
+        """
+        reset is a method that removes all collected metrics.
+
+        :return: None
+        """
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.gauges.clear()
+
+    def to_json(self):
+        """
+        to_json is a method that returns all metrics as a dict that can be saved as JSON.
+
+        :return: dict
+        """
+        with self.lock:
+            histograms = [{'name': PREFIX + name, 'labels': dict(labels),
+                           'buckets': dict(zip(map(str, BUCKETS), histogram['buckets'])),
+                           'sum': histogram['sum'], 'count': histogram['count']}
+                          for (name, labels), histogram in sorted(self.histograms.items())]
+            counters = [{'name': PREFIX + name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in sorted(self.counters.items())]
+            gauges = [{'name': PREFIX + name, 'labels': dict(labels), 'value': value}
+                      for (name, labels), value in sorted(self.gauges.items())]
+        return {'histograms': histograms, 'counters': counters, 'gauges': gauges}
+
+    def to_prometheus(self):
+        """
+        to_prometheus is a method that returns all metrics in Prometheus text format.
+
+        :return: str
+        """
+        lines = []
+        typed = set()
+        with self.lock:
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                if name not in typed:
+                    lines.append(f'# TYPE {PREFIX}{name} histogram')
+                    typed.add(name)
+                cumulative = 0
+                for bound, number in zip(BUCKETS, histogram['buckets']):
+                    cumulative += number
+                    bucket_labels = _labels_text(labels + (('le', bound),))
+                    lines.append(f'{PREFIX}{name}_bucket{{{bucket_labels}}} {cumulative}')
+                bucket_labels = _labels_text(labels + (('le', '+Inf'),))
+                lines.append(f'{PREFIX}{name}_bucket{{{bucket_labels}}} {histogram["count"]}')
+                lines.append(f'{PREFIX}{name}_sum{{{_labels_text(labels)}}} {histogram["sum"]}')
+                lines.append(f'{PREFIX}{name}_count{{{_labels_text(labels)}}} {histogram["count"]}')
+            for kind, values in (('counter', self.counters), ('gauge', self.gauges)):
+                for (name, labels), value in sorted(values.items()):
+                    if name not in typed:
+                        lines.append(f'# TYPE {PREFIX}{name} {kind}')
+                        typed.add(name)
+                    lines.append(f'{PREFIX}{name}{{{_labels_text(labels)}}} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path):
+        """
+        export is a method that saves all metrics to a file:
+        JSON if path ends with '.json', Prometheus text format otherwise.
+
+        :param path: example: 'crawl.prom'
+        :return: None
+        """
+        with open(path, 'w') as file:
+            if path.endswith('.json'):
+                json.dump(self.to_json(), file, indent=2)
+            else:
+                file.write(self.to_prometheus())
+
+
+REGISTRY = Metrics()
@@ -0,0 +1,94 @@
+"""
+It is a module that moves parsing of downloaded pages from I/O threads to worker processes.
+A crawl is a pipeline of three stages:
+
+- I/O threads download pages (fetching.fetch_pages, work_ua_vacancies.crawl_listings);
+  no more than workers * 2 pages are in flight, so the downloading stage waits for the others
+- ParsePool processes build the HTML tree and normalize the records, so parsing is not
+  serialized by the GIL and uses all cores; an I/O thread hands its page to the pool
+  (ParsePool.submit) and goes back to downloading, pages that are being parsed count
+  in the workers * 2 pages in flight, so downloading waits when parsing falls behind
+- the calling thread saves the records (sink.BufferedWriter) or yields them
+
+    with ParsePool(processes=4) as pool:
+        future = pool.submit(work_ua_vacancies.read_listing_page, content, 'kyiv', 'it')
+        vacancies, total, page_size = future.result()
+"""
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from metrics import REGISTRY
+
+
+def _run(function, args):
+    REGISTRY.reset()
+    result = function(*args)
+    return result, REGISTRY.snapshot()
+
+
+class ParsePool:
+    """
+    ParsePool is a class that runs parse functions in a pool of processes.
+    Metrics that the functions record in the worker processes are added to metrics.REGISTRY.
+    With processes=0 functions run in the calling thread, like without the pool.
+    It is used as a context manager:
+
+        with ParsePool(processes=4) as pool:
+            vacancy = pool.run(parse_vacancy_page, url, content)
+
+    :param processes: number of worker processes (None means number of CPUs)
+    """
+
+    def __init__(self, processes=0):
+        self.processes = processes
+        self.executor = None
+
+    def __enter__(self):
+        if self.processes != 0:
+            self.executor = ProcessPoolExecutor(max_workers=self.processes)
+            # start the processes before I/O threads are started, so they are not forked
+            # while another thread holds a lock
+            self.executor.submit(int).result()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def run(self, function, *args):
+        """
+        run is a method that calls function(*args) in a worker process and returns its result.
+        The function has to be defined at module level, so it can be sent to the process.
+
+        :param function: parse function. Example: djinni_vacancies.parse_vacancy_page
+        :param args: arguments of the function
+        :return: result of the function
+        """
+        result = self.submit(function, *args)
+        return result.result() if isinstance(result, Future) else result
+
+    def submit(self, function, *args):
+        """
+        submit is a method that sends function(*args) to a worker process without waiting
+        for it. With processes=0 the function is called in the calling thread.
+
+        :param function: parse function. Example: djinni_vacancies.parse_vacancy_page
+        :param args: arguments of the function
+        :return: concurrent.futures.Future of the result (metrics of the function are added
+                 to metrics.REGISTRY when it is done) or the result itself with processes=0
+        """
+        if self.executor is None:
+            return function(*args)
+        result = Future()
+
+        def done(future):
+            try:
+                value, metrics = future.result()
+            except BaseException as error:
+                result.set_exception(error)
+            else:
+                REGISTRY.merge(metrics)
+                result.set_result(value)
+
+        self.executor.submit(_run, function, args).add_done_callback(done)
+        return result
@@ -0,0 +1,180 @@
+"""
+It is a module that controls how fast requests are sent to one host.
+Every host has a HostController: a token bucket (rate requests/sec) plus a limit of requests
+in flight that follows the rate (rate * latency, Little's law). The rate is adapted by AIMD:
+
+- until the host shows the first sign of overload, only max_concurrency limits requests,
+- on 429, when more than max_error_rate of recent requests fail (5xx, timeouts, connection
+  errors) and when latency grows above latency_factor * the lowest recent latency,
+  the rate becomes decrease * the measured number of responses per second (at most once
+  per latency, so one burst of errors is one decrease),
+- after that it grows by increase requests/sec every second while requests have to wait
+  for it,
+- Retry-After stops all requests to the host until the time it asks for.
+
+The current rate and limit are gauges host_rate and host_concurrency in metrics.REGISTRY.
+"""
+import math
+import threading
+import time
+
+from metrics import REGISTRY
+
+
+class HostController:
+    """
+    HostController is a class that decides when a request to a host can be sent.
+
+        controller = HostController('www.work.ua')
+        with controller:
+            start = time.perf_counter()
+            response = session.get(url)
+        controller.success(time.perf_counter() - start)
+
+    :param host: example: 'www.work.ua'
+    :param max_concurrency: max number of requests in flight
+    :param min_rate: the rate never goes below it
+    :param max_rate: the rate never goes above it (it is the rate before the first decrease)
+    :param increase: requests/sec added every second of fast successful responses
+    :param decrease: factor of the rate after an error or a slow response
+    :param latency_factor: latency above latency_factor * lowest latency is a slowdown
+    :param max_error_rate: share of failed requests (moving average) that is an overload
+    """
+
+    def __init__(self, host, max_concurrency=8, min_rate=0.2, max_rate=500.0, increase=2.0,
+                 decrease=0.5, latency_factor=3.0, max_error_rate=0.1):
+        self.host = host
+        self.rate = max_rate
+        self.max_concurrency = max_concurrency
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.max_error_rate = max_error_rate
+        self.error_rate = 0.0
+        self.tokens = 1.0
+        self.refilled_at = time.monotonic()
+        self.paused_until = 0.0
+        self.decreased_at = 0.0
+        self.increased_at = time.monotonic()
+        self.latency = None
+        self.lowest_latency = None
+        self.throughput = None
+        self.window_start = time.monotonic()
+        self.window_responses = 0
+        self.in_flight = 0
+        self.waited = False
+        self.condition = threading.Condition()
+        self._publish()
+
+    @property
+    def limit(self):
+        """
+        limit is a property that returns the number of requests that can be in flight.
+        """
+        if self.latency is None:
+            return self.max_concurrency
+        return max(1, min(self.max_concurrency, math.ceil(self.rate * self.latency) + 1))
+
+    def _publish(self):
+        REGISTRY.set('host_rate', self.rate, host=self.host)
+        REGISTRY.set('host_concurrency', self.limit, host=self.host)
+
+    def _refill(self, now):
+        burst = max(1.0, min(self.rate, self.max_concurrency))
+        self.tokens = min(burst, self.tokens + (now - self.refilled_at) * self.rate)
+        self.refilled_at = now
+
+    def acquire(self):
+        """
+        acquire is a method that waits until a request can be sent and takes a token.
+
+        :return: None
+        """
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.paused_until:
+                    self.condition.wait(self.paused_until - now)
+                elif self.in_flight >= self.limit:
+                    self.waited = True
+                    self.condition.wait()
+                elif self.tokens < 1:
+                    self.waited = True
+                    self.condition.wait((1 - self.tokens) / self.rate)
+                else:
+                    self.tokens -= 1
+                    self.in_flight += 1
+                    return
+
+    def release(self):
+        """
+        release is a method that is called when a request is finished.
+
+        :return: None
+        """
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    def _decrease(self, now):
+        if now - self.decreased_at < (self.latency or 1.0):
+            return
+        self.decreased_at = self.increased_at = now
+        rate = self.rate if self.throughput is None else min(self.rate, self.throughput)
+        self.rate = max(self.min_rate, rate * self.decrease)
+
+    def success(self, latency):
+        """
+        success is a method that is called with the latency of a successful response.
+
+        :param latency: seconds
+        :return: None
+        """
+        with self.condition:
+            now = time.monotonic()
+            self.window_responses += 1
+            if now - self.window_start >= 1.0:
+                self.throughput = self.window_responses / (now - self.window_start)
+                self.window_start, self.window_responses = now, 0
+            self.error_rate *= 0.98
+            self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+            # the lowest latency slowly goes up, so a host that became slower for good
+            # does not look congested forever
+            self.lowest_latency = min(latency, (self.lowest_latency or latency) * 1.01)
+            if self.latency > self.latency_factor * self.lowest_latency:
+                self._decrease(now)
+            elif self.waited:
+                # the rate grows only while requests have to wait for it
+                self.waited = False
+                self.rate = min(self.max_rate,
+                                self.rate + self.increase * (now - self.increased_at))
+            self.increased_at = now
+            self._publish()
+            self.condition.notify_all()
+
+    def failure(self, retry_after=None, throttled=False):
+        """
+        failure is a method that is called after an error response or a failed request.
+
+        :param retry_after: seconds that the host asked to wait (Retry-After) or None
+        :param throttled: True if the host said that there are too many requests (429)
+        :return: None
+        """
+        with self.condition:
+            now = time.monotonic()
+            self.error_rate = 0.98 * self.error_rate + 0.02
+            if throttled or retry_after is not None or self.error_rate > self.max_error_rate:
+                self._decrease(now)
+            if retry_after is not None:
+                self.paused_until = max(self.paused_until, now + retry_after)
+            self._publish()
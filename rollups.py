@@ -0,0 +1,263 @@
+"""
+It is a module that keeps vacancy counts and salary distributions of work.ua per
+(publication_date, vacancy_city, vacancy_category) in SQL database. iter_vacancies updates them
+after every saved batch, so dashboards read small rollup tables instead of all vacancies:
+
+- work_ua_rollup_members   (vacancy_id, vacancy_city, vacancy_category) that are counted,
+                           a vacancy that is crawled again is not counted twice
+- work_ua_volume           vacancies, vacancies with salary and sum of salaries
+- work_ua_salary_buckets   salaries as a log-bucket sketch (see SalarySketch):
+                           number of salaries per bucket
+
+All updates only add numbers, so sketches of days, cities and categories are merged by summing
+their buckets in SQL, and concurrent writers do not lose updates.
+
+    read_rollups(engine, by=['vacancy_city'], since=datetime.date(2019, 2, 1),
+                 vacancy_category='it', quantiles=(0.5, 0.9))
+"""
+import math
+import threading
+
+RELATIVE_ACCURACY = 0.01
+GROUPS = ['publication_date', 'vacancy_city', 'vacancy_category']
+MEMBERS_TABLE = 'work_ua_rollup_members'
+VOLUME_TABLE = 'work_ua_volume'
+BUCKETS_TABLE = 'work_ua_salary_buckets'
+
+_created = set()
+_created_lock = threading.Lock()
+
+
+class SalarySketch:
+    """
+    SalarySketch is a class that keeps positive values in buckets whose bounds grow by gamma,
+    so every quantile is returned with relative error no more than relative_accuracy.
+    Two sketches with the same relative_accuracy are merged by adding their buckets.
+
+    :param buckets: dict bucket -> number of values
+    :param relative_accuracy: max relative error of quantiles
+    """
+
+    def __init__(self, buckets=None, relative_accuracy=RELATIVE_ACCURACY):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.buckets = dict(buckets or {})
+
+    @property
+    def count(self):
+        return sum(self.buckets.values())
+
+    def bucket(self, value):
+        """
+        bucket is a method that returns the bucket of a positive value.
+
+        :param value: number > 0
+        :return: int
+        """
+        return math.ceil(math.log(value, self.gamma))
+
+    def add(self, value, number=1):
+        """
+        add is a method that adds a value to the sketch (values <= 0 are skipped).
+
+        :param value: number
+        :param number: how many times the value is added
+        :return: None
+        """
+        if value is None or not value > 0:
+            return
+        bucket = self.bucket(value)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + number
+
+    def merge(self, other):
+        """
+        merge is a method that adds buckets of another sketch to this one.
+
+        :param other: SalarySketch
+        :return: None
+        """
+        for bucket, number in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + number
+
+    def quantile(self, q):
+        """
+        quantile is a method that returns an estimate of a quantile.
+
+        :param q: from 0 to 1. Example: 0.5 for the median
+        :return: float or None if the sketch is empty
+        """
+        count = self.count
+        if not count:
+            return None
+        rank = q * (count - 1)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen > rank:
+                return 2 * self.gamma ** bucket / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+
+def create_rollup_tables(engine):
+    """
+    create_rollup_tables is a function that creates rollup tables if they do not exist.
+
+    :param engine: a sqlalchemy engine
+    :return: None
+    """
+    from sqlalchemy import text
+
+    with _created_lock:
+        if engine.url in _created:
+            return
+        statements = [
+            f'CREATE TABLE IF NOT EXISTS {MEMBERS_TABLE} ('
+            'vacancy_id TEXT NOT NULL, vacancy_city TEXT NOT NULL, '
+            'vacancy_category TEXT NOT NULL, '
+            'PRIMARY KEY (vacancy_id, vacancy_city, vacancy_category))',
+            f'CREATE TABLE IF NOT EXISTS {VOLUME_TABLE} ('
+            'publication_date DATE NOT NULL, vacancy_city TEXT NOT NULL, '
+            'vacancy_category TEXT NOT NULL, vacancies BIGINT NOT NULL, '
+            'salaries BIGINT NOT NULL, salary_sum BIGINT NOT NULL, '
+            'PRIMARY KEY (publication_date, vacancy_city, vacancy_category))',
+            f'CREATE TABLE IF NOT EXISTS {BUCKETS_TABLE} ('
+            'publication_date DATE NOT NULL, vacancy_city TEXT NOT NULL, '
+            'vacancy_category TEXT NOT NULL, bucket INTEGER NOT NULL, vacancies BIGINT NOT NULL, '
+            'PRIMARY KEY (publication_date, vacancy_city, vacancy_category, bucket))',
+        ]
+        with engine.begin() as connection:
+            for statement in statements:
+                connection.execute(text(statement))
+        _created.add(engine.url)
+
+
+def _new_members(connection, frame):
+    from sqlalchemy import text
+
+    new = []
+    keys = ['vacancy_id', 'vacancy_city', 'vacancy_category']
+    for start in range(0, len(frame), 300):
+        chunk = frame.iloc[start:start + 300]
+        values = ', '.join(f'(:i{i}, :c{i}, :k{i})' for i in range(len(chunk)))
+        parameters = {}
+        for i, (vacancy_id, city, category) in enumerate(chunk[keys].itertuples(index=False)):
+            parameters.update({f'i{i}': str(vacancy_id), f'c{i}': city, f'k{i}': category})
+        rows = connection.execute(text(
+            f'INSERT INTO {MEMBERS_TABLE} ({", ".join(keys)}) VALUES {values} '
+            f'ON CONFLICT DO NOTHING RETURNING {", ".join(keys)}'), parameters)
+        new.extend(tuple(row) for row in rows)
+    frame = frame.assign(vacancy_id=frame.vacancy_id.map(str)).set_index(keys)
+    return frame.loc[frame.index.isin(new)].reset_index()
+
+
+def update_rollups(vacancies, engine):
+    """
+    update_rollups is a function that adds vacancies that are not counted yet to the rollups
+    in one transaction. It is called by iter_vacancies for every saved batch and can be called
+    with vacancies of old crawls, for example:
+    update_rollups(storage.read_entity(engine, 'work_ua_vacancies', crawl_date), engine).
+
+    :param vacancies: pandas.DataFrame or list of dicts like parse_cards returns
+    :param engine: a sqlalchemy engine
+    :return: number of vacancies that were added
+    """
+    import pandas as pd
+    from sqlalchemy import text
+
+    frame = pd.DataFrame(vacancies)
+    if frame.empty:
+        return 0
+    frame = frame.dropna(subset=['vacancy_id', 'vacancy_city', 'vacancy_category',
+                                 'publication_date'])
+    frame = frame.drop_duplicates(['vacancy_id', 'vacancy_city', 'vacancy_category'])
+    create_rollup_tables(engine)
+    sketch = SalarySketch()
+    with engine.begin() as connection:
+        frame = _new_members(connection, frame)
+        if frame.empty:
+            return 0
+        frame['publication_date'] = frame.publication_date.map(str)
+        salary = pd.to_numeric(frame.vacancy_salary, errors='coerce')
+        frame['salary'] = salary.where(salary > 0)
+        grouped = frame.groupby(GROUPS)
+        volume = pd.DataFrame({'vacancies': grouped.size(),
+                               'salaries': grouped.salary.count(),
+                               'salary_sum': grouped.salary.sum()}).reset_index()
+        volume['salary_sum'] = volume.salary_sum.round().astype('int64')
+        connection.execute(text(
+            f'INSERT INTO {VOLUME_TABLE} ({", ".join(GROUPS)}, vacancies, salaries, salary_sum) '
+            f'VALUES (:publication_date, :vacancy_city, :vacancy_category, :vacancies, '
+            f':salaries, :salary_sum) ON CONFLICT ({", ".join(GROUPS)}) DO UPDATE SET '
+            f'vacancies = {VOLUME_TABLE}.vacancies + excluded.vacancies, '
+            f'salaries = {VOLUME_TABLE}.salaries + excluded.salaries, '
+            f'salary_sum = {VOLUME_TABLE}.salary_sum + excluded.salary_sum'),
+            volume.astype(object).to_dict('records'))
+        salaries = frame.dropna(subset=['salary'])
+        if not salaries.empty:
+            salaries = salaries.assign(bucket=salaries.salary.map(sketch.bucket))
+            buckets = salaries.groupby(GROUPS + ['bucket']).size().reset_index(name='vacancies')
+            connection.execute(text(
+                f'INSERT INTO {BUCKETS_TABLE} ({", ".join(GROUPS)}, bucket, vacancies) '
+                f'VALUES (:publication_date, :vacancy_city, :vacancy_category, :bucket, '
+                f':vacancies) ON CONFLICT ({", ".join(GROUPS)}, bucket) DO UPDATE SET '
+                f'vacancies = {BUCKETS_TABLE}.vacancies + excluded.vacancies'),
+                buckets.astype(object).to_dict('records'))
+    return len(frame)
+
+
+def read_rollups(engine, by=('vacancy_city', 'vacancy_category'), since=None, until=None,
+                 quantiles=(0.5,), **filters):
+    """
+    read_rollups is a function that reads vacancy counts and salary quantiles
+    from rollup tables.
+
+    :param engine: a sqlalchemy engine
+    :param by: list of groups from GROUPS. Example: ['vacancy_city']
+    :param since: datetime.date, vacancies published on or after it
+    :param until: datetime.date, vacancies published before it
+    :param quantiles: salary quantiles. Example: (0.5, 0.9)
+    :param filters: publication_date, vacancy_city or vacancy_category. Example: vacancy_city='kyiv'
+    :return: pandas.DataFrame with group columns, vacancies, salaries, mean_salary
+             and salary_p{quantile * 100} columns (like salary_p50)
+    """
+    import pandas as pd
+    from sqlalchemy import text
+
+    by = list(by)
+    unknown = [name for name in by + list(filters) if name not in GROUPS]
+    if unknown:
+        raise ValueError(f'unknown groups: {unknown}')
+    create_rollup_tables(engine)
+    conditions = ['1 = 1']
+    parameters = {}
+    if since is not None:
+        conditions.append('publication_date >= :since')
+        parameters['since'] = str(since)
+    if until is not None:
+        conditions.append('publication_date < :until')
+        parameters['until'] = str(until)
+    for name, value in filters.items():
+        conditions.append(f'{name} = :{name}')
+        parameters[name] = str(value)
+    where = ' AND '.join(conditions)
+    group_by = f'GROUP BY {", ".join(by)}' if by else ''
+    with engine.connect() as connection:
+        volume = pd.DataFrame(connection.execute(text(
+            f'SELECT {"".join(name + ", " for name in by)}SUM(vacancies) AS vacancies, '
+            f'SUM(salaries) AS salaries, SUM(salary_sum) AS salary_sum '
+            f'FROM {VOLUME_TABLE} WHERE {where} {group_by}'), parameters).fetchall(),
+            columns=by + ['vacancies', 'salaries', 'salary_sum'])
+        buckets = connection.execute(text(
+            f'SELECT {"".join(name + ", " for name in by)}bucket, SUM(vacancies) '
+            f'FROM {BUCKETS_TABLE} WHERE {where} GROUP BY {", ".join(by + ["bucket"])}'),
+            parameters).fetchall()
+    volume = volume.dropna(subset=['vacancies'])
+    sketches = {}
+    for row in buckets:
+        group = tuple(str(value) for value in row[:len(by)])
+        sketches.setdefault(group, SalarySketch()).buckets[row[-2]] = row[-1]
+    volume['mean_salary'] = volume.salary_sum / volume.salaries.where(volume.salaries > 0)
+    groups = [tuple(str(volume.at[i, name]) for name in by) for i in volume.index]
+    for q in quantiles:
+        volume[f'salary_p{q * 100:g}'] = [sketches[group].quantile(q) if group in sketches
+                                          else None for group in groups]
+    return volume.drop(columns='salary_sum').reset_index(drop=True)
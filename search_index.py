@@ -0,0 +1,166 @@
+"""
+It is a module that has a local full-text index of djinni.co vacancies (position, title
+and descriptions) in a SQLite FTS5 table. iter_vacancies adds vacancies to it as they are
+parsed, so questions like how many vacancies mention Kubernetes in Kyiv this month
+are answered from the index instead of scanning descriptions.
+
+    index = VacancyIndex()
+    index.count('kubernetes', by=['city', 'month'], since=datetime.date(2019, 2, 1))
+    index.count('"machine learning" AND (python OR scala) NOT junior', city='Киев')
+    index.count('"c++" OR "c#"', by=['specialization'])
+
+Words are split by the unicode61 tokenizer: letters of any alphabet (Ukrainian, Russian,
+English) are case-folded, diacritics are kept (so 'й' is not 'и'), '+' and '#' are
+parts of words (c++, c#). Queries use FTS5 syntax: words, "phrases", AND/OR/NOT,
+parentheses and prefixes (kube*).
+"""
+import datetime
+import sqlite3
+
+INDEX_PATH = 'vacancy_index.sqlite3'
+GROUPS = {
+    'city': 'd.city',
+    'specialization': 'd.specialization',
+    'published_date': 'd.published_date',
+    'month': 'substr(d.published_date, 1, 7)',
+}
+
+
+class VacancyIndex:
+    """
+    VacancyIndex is a class that keeps an inverted index of vacancy texts.
+    Every vacancy link is indexed once, indexing it again replaces its text.
+
+    :param path: path to the SQLite file
+    """
+
+    def __init__(self, path=INDEX_PATH):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS documents ('
+                                'id INTEGER PRIMARY KEY, '
+                                'vacancy_link TEXT NOT NULL UNIQUE, '
+                                'city TEXT, '
+                                'specialization TEXT, '
+                                'published_date TEXT)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS documents_published_date '
+                                'ON documents (published_date)')
+        self.connection.execute('CREATE VIRTUAL TABLE IF NOT EXISTS terms USING fts5('
+                                'position, title, descriptions, '
+                                "tokenize = \"unicode61 remove_diacritics 0 tokenchars '+#'\", "
+                                "prefix = '3')")
+        self.connection.commit()
+
+    def add(self, vacancies):
+        """
+        add is a method that indexes vacancies in one transaction.
+
+        :param vacancies: iterable of dicts with vacancy_link, position, title, descriptions,
+                          city, specialization and published_date (like iter_vacancies yields)
+        :return: number of indexed vacancies
+        """
+        number = 0
+        with self.connection:
+            for vacancy in vacancies:
+                published_date = vacancy.get('published_date')
+                row = self.connection.execute(
+                    'INSERT INTO documents (vacancy_link, city, specialization, published_date) '
+                    'VALUES (?, ?, ?, ?) ON CONFLICT (vacancy_link) DO UPDATE SET '
+                    'city = excluded.city, specialization = excluded.specialization, '
+                    'published_date = excluded.published_date RETURNING id',
+                    (vacancy['vacancy_link'], vacancy.get('city'), vacancy.get('specialization'),
+                     None if published_date is None else str(published_date))).fetchone()
+                self.connection.execute('DELETE FROM terms WHERE rowid = ?', row)
+                self.connection.execute(
+                    'INSERT INTO terms (rowid, position, title, descriptions) VALUES (?, ?, ?, ?)',
+                    (row[0], vacancy.get('position'), vacancy.get('title'),
+                     vacancy.get('descriptions')))
+                number += 1
+        return number
+
+    def add_saved(self, engine, crawl_date=None):
+        """
+        add_saved is a method that indexes vacancies of one crawl saved in SQL database,
+        for example to build the index for crawls made before it existed.
+
+        :param engine: a sqlalchemy engine
+        :param crawl_date: datetime.date (today if None)
+        :return: number of indexed vacancies
+        """
+        from storage import read_entity
+
+        vacancies = read_entity(engine, 'djinni_vacancies', crawl_date, texts=True)
+        vacancies = vacancies.astype(object).where(vacancies.notnull(), None)
+        return self.add(vacancies.to_dict('records'))
+
+    def _where(self, query, since, until, filters):
+        conditions = ['terms MATCH ?']
+        parameters = [query]
+        if since is not None:
+            conditions.append('d.published_date >= ?')
+            parameters.append(str(since))
+        if until is not None:
+            conditions.append('d.published_date < ?')
+            parameters.append(str(until))
+        for name, value in filters.items():
+            if name not in ('city', 'specialization'):
+                raise ValueError(f'unknown filter: {name}')
+            conditions.append(f'd.{name} = ?')
+            parameters.append(value)
+        return ' AND '.join(conditions), parameters
+
+    def count(self, query, by=(), since=None, until=None, **filters):
+        """
+        count is a method that counts vacancies that match a query.
+
+        :param query: FTS5 query. Example: 'kubernetes', '"data engineer" NOT junior'
+        :param by: list of groups from GROUPS. Example: ['city', 'month']
+        :param since: datetime.date, vacancies published on or after it
+        :param until: datetime.date, vacancies published before it
+        :param filters: city and specialization. Example: city='Киев'
+        :return: pandas.DataFrame with group columns and count column
+        """
+        import pandas as pd
+
+        unknown = [group for group in by if group not in GROUPS]
+        if unknown:
+            raise ValueError(f'unknown groups: {unknown}')
+        where, parameters = self._where(query, since, until, filters)
+        groups = [f'{GROUPS[group]} AS {group}' for group in by]
+        sql = (f'SELECT {", ".join(groups + ["COUNT(*) AS count"])} '
+               f'FROM terms JOIN documents d ON d.id = terms.rowid WHERE {where}')
+        if by:
+            sql += f' GROUP BY {", ".join(by)} ORDER BY count DESC'
+        rows = self.connection.execute(sql, parameters).fetchall()
+        return pd.DataFrame(rows, columns=list(by) + ['count'])
+
+    def links(self, query, limit=100, since=None, until=None, **filters):
+        """
+        links is a method that returns links of the best matching vacancies.
+
+        :param query: FTS5 query (see count)
+        :param limit: max number of links
+        :param since: datetime.date, vacancies published on or after it
+        :param until: datetime.date, vacancies published before it
+        :param filters: city and specialization
+        :return: list of vacancy links, best matches first
+        """
+        where, parameters = self._where(query, since, until, filters)
+        rows = self.connection.execute(
+            f'SELECT d.vacancy_link FROM terms JOIN documents d ON d.id = terms.rowid '
+            f'WHERE {where} ORDER BY rank LIMIT ?', parameters + [limit])
+        return [row[0] for row in rows]
+
+
+def month_range(day):
+    """
+    month_range is a function that returns since and until of the month of a day.
+
+        since, until = month_range(datetime.date.today())
+        index.count('kubernetes', by=['city'], since=since, until=until)
+
+    :param day: datetime.date
+    :return: (first day of the month, first day of the next month)
+    """
+    first = day.replace(day=1)
+    return first, (first + datetime.timedelta(days=32)).replace(day=1)
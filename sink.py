@@ -0,0 +1,146 @@
+"""
+It is a module that has a buffered writer to save parsed rows into SQL database in large batches.
+"""
+import csv
+import io
+import time
+
+import pandas as pd
+
+from metrics import REGISTRY
+
+
+def to_csv(frame):
+    """
+    to_csv is a function that writes a pandas.DataFrame into a CSV buffer for COPY.
+
+    :param frame: pandas.DataFrame
+    :return: io.StringIO positioned at its start
+    """
+    frame = frame.copy()
+    for column in frame.columns:
+        # a float column that only holds integers (NaN made it float) is written as integers
+        # so COPY can load it into a BIGINT column
+        if frame[column].dtype.kind == 'f' and frame[column].dropna().apply(float.is_integer).all():
+            frame[column] = frame[column].map(lambda value: None if pd.isnull(value) else int(value))
+    buffer = io.StringIO()
+    frame.to_csv(buffer, index=False, header=False, quoting=csv.QUOTE_MINIMAL)
+    buffer.seek(0)
+    return buffer
+
+
+class BufferedWriter:
+    """
+    BufferedWriter is a class that collects rows and saves them with one COPY or
+    multi-row insert per batch instead of one transaction per row.
+    It is used as a context manager, so the last rows are saved on exit and on error:
+
+        with BufferedWriter(engine, 'djinni_vacancies') as writer:
+            writer.write({"vacancy_link": url, ...})
+
+    :param engine: a sqlalchemy engine
+    :param table: table name
+    :param batch_size: number of rows that starts a flush
+    :param flush_interval: number of seconds after which buffered rows are flushed on next write
+                           (rows are not flushed while nothing is written)
+    :param on_flush: function that is called with the list of rows after they are saved
+    :param entry_point: entry point for metrics. Example: 'djinni.get_vacancies'
+    :param journal: crawl_state.CrawlJournal that gets units passed to write/write_many
+                    when the batch with their rows is saved
+    :param save: function(frame, table, engine) that saves a batch
+                 (storage.upsert if None, it replaces rows with the same key)
+    """
+
+    def __init__(self, engine, table, batch_size=1000, flush_interval=30, on_flush=None,
+                 entry_point='unknown', journal=None, save=None):
+        if save is None:
+            from storage import upsert
+
+            save = upsert
+        self.engine = engine
+        self.table = table
+        self.entry_point = entry_point
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self.journal = journal
+        self.save = save
+        self.rows = []
+        self.units = []
+        self.rows_written = 0
+        self.last_flush = time.time()
+
+    def write(self, row, unit=None):
+        """
+        write is a method that adds one row (dict) to the buffer.
+
+        :param row: dict column -> value
+        :param unit: unit of the crawl (page or url) that is completed when the row is saved
+        :return: None
+        """
+        self.write_many([row], unit)
+
+    def write_many(self, rows, unit=None):
+        """
+        write_many is a method that adds many rows to the buffer.
+
+        :param rows: list of dicts or pandas.DataFrame (can be empty)
+        :param unit: unit of the crawl (page or url) that is completed when all rows are saved
+        :return: None
+        """
+        if isinstance(rows, pd.DataFrame):
+            rows = rows.to_dict('records')
+        for row in rows:
+            self.rows.append(row)
+            if len(self.rows) >= self.batch_size:
+                self.flush()
+        if unit is not None:
+            self.units.append(unit)
+        if time.time() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """
+        flush is a method that saves all buffered rows into the table.
+
+        :return: None
+        """
+        self.last_flush = time.time()
+        rows, self.rows = self.rows, []
+        units, self.units = self.units, []
+        if rows:
+            with REGISTRY.timed('write', self.entry_point):
+                self.save(pd.DataFrame(rows), self.table, self.engine)
+            self.rows_written += len(rows)
+            REGISTRY.inc('rows_written_total', len(rows), entry_point=self.entry_point)
+            if self.on_flush is not None:
+                self.on_flush(rows)
+        if self.journal is not None and units:
+            self.journal.complete(units)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+
+def frames(records, size=1000):
+    """
+    frames is a function that groups records of a streaming crawl into small DataFrames:
+
+        for frame in frames(work_ua_vacancies.iter_vacancies(cities, categories)):
+            ...
+
+    :param records: iterable of dicts
+    :param size: number of rows in one DataFrame (the last one can be smaller)
+    :return: generator of pandas.DataFrame
+    """
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield pd.DataFrame(chunk)
+            chunk = []
+    if chunk:
+        yield pd.DataFrame(chunk)
@@ -0,0 +1,301 @@
+"""
+It is a module that has one table per entity for all crawls instead of a table per day.
+Every row has crawl_date; on PostgreSQL the tables are partitioned by crawl_date
+(a partition per day is created on the first write), and every table has a primary key,
+so saving the same rows again updates them instead of adding duplicates.
+Every key starts with crawl_date, so a vacancy is looked up across days
+(its history, whether it was seen before) by its own index:
+
+- djinni_vacancy_links  (crawl_date, vacancy_link)
+- djinni_vacancies      (crawl_date, vacancy_link), indexes on vacancy_link, specialization,
+                        city and published_date
+- work_ua_vacancies     (crawl_date, vacancy_id, vacancy_city, vacancy_category),
+                        indexes on vacancy_id, vacancy_city, vacancy_category
+                        and publication_date
+- work_ua_cities        (crawl_date, city_id), index on city_lat_name
+- work_ua_categories    (crawl_date, category_lat_name)
+
+Large texts of djinni_vacancies (descriptions and about_company) are stored once per content
+in vacancy_texts (digest -> zlib compressed text), vacancy rows have their sha256 digests
+(descriptions_digest and about_company_digest). A company description that is the same in all
+its vacancies or a reposted description takes no space again, and a changed description
+is a changed digest.
+
+    vacancies = read_entity(engine, 'work_ua_vacancies', datetime.date(2019, 2, 22))
+"""
+import datetime
+import hashlib
+import threading
+import zlib
+
+import pandas as pd
+
+from sink import to_csv
+
+SCHEMA = {
+    'djinni_vacancy_links': {
+        'columns': {'vacancy_link': 'TEXT NOT NULL'},
+        'key': ['vacancy_link'],
+        'indexes': [],
+    },
+    'djinni_vacancies': {
+        'columns': {'vacancy_link': 'TEXT NOT NULL', 'position': 'TEXT', 'specialization': 'TEXT',
+                    'city': 'TEXT', 'title': 'TEXT', 'published_date': 'DATE', 'recruiter': 'TEXT',
+                    'recruiter_company': 'TEXT', 'recruiter_link': 'TEXT',
+                    'descriptions_digest': 'TEXT', 'about_company_digest': 'TEXT'},
+        'key': ['vacancy_link'],
+        'indexes': [['vacancy_link'], ['specialization'], ['city'], ['published_date']],
+        'texts': ['descriptions', 'about_company'],
+    },
+    'work_ua_vacancies': {
+        'columns': {'vacancy_id': 'TEXT NOT NULL', 'vacancy_link': 'TEXT',
+                    'vacancy_title': 'TEXT', 'company_title': 'TEXT', 'vacancy_salary': 'BIGINT',
+                    'publication_date': 'DATE', 'vacancy_city': 'TEXT NOT NULL',
+                    'vacancy_category': 'TEXT NOT NULL'},
+        'key': ['vacancy_id', 'vacancy_city', 'vacancy_category'],
+        'indexes': [['vacancy_id'], ['vacancy_city'], ['vacancy_category'],
+                    ['publication_date']],
+    },
+    'work_ua_cities': {
+        'columns': {'city_id': 'BIGINT NOT NULL', 'city_name': 'TEXT', 'city_lat_name': 'TEXT',
+                    'city_link': 'TEXT', 'city_latitude': 'DOUBLE PRECISION',
+                    'city_longitude': 'DOUBLE PRECISION'},
+        'key': ['city_id'],
+        'indexes': [['city_lat_name']],
+    },
+    'work_ua_categories': {
+        'columns': {'category_lat_name': 'TEXT NOT NULL', 'category_name': 'TEXT',
+                    'category_link': 'TEXT', 'category_value': 'TEXT'},
+        'key': ['category_lat_name'],
+        'indexes': [],
+    },
+}
+
+TEXTS_TABLE = 'vacancy_texts'
+
+_created = set()
+_created_lock = threading.Lock()
+
+
+def columns(entity):
+    """
+    columns is a function that returns columns of an entity table.
+
+    :param entity: table name from SCHEMA
+    :return: list of column names (crawl_date is the first one)
+    """
+    return ['crawl_date'] + list(SCHEMA[entity]['columns'])
+
+
+def _execute(engine, statements):
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        for statement in statements:
+            cursor.execute(statement)
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def create_schema(engine, entity, crawl_date):
+    """
+    create_schema is a function that creates an entity table with its indexes and,
+    on PostgreSQL, the partition for crawl_date if they do not exist.
+
+    :param engine: a sqlalchemy engine
+    :param entity: table name from SCHEMA
+    :param crawl_date: datetime.date
+    :return: None
+    """
+    postgres = engine.dialect.name == 'postgresql'
+    partition = f'{entity}_{crawl_date:%Y%m%d}'
+    with _created_lock:
+        if (engine.url, partition) in _created:
+            return
+        table = SCHEMA[entity]
+        definition = ', '.join(['crawl_date DATE NOT NULL'] +
+                               [f'{name} {kind}' for name, kind in table['columns'].items()] +
+                               [f'PRIMARY KEY (crawl_date, {", ".join(table["key"])})'])
+        statements = [f'CREATE TABLE IF NOT EXISTS {entity} ({definition})' +
+                      (' PARTITION BY RANGE (crawl_date)' if postgres else '')]
+        statements += [f'CREATE INDEX IF NOT EXISTS {entity}_{"_".join(index)} '
+                       f'ON {entity} ({", ".join(index)})' for index in table['indexes']]
+        if postgres:
+            statements.append(f"CREATE TABLE IF NOT EXISTS {partition} PARTITION OF {entity} "
+                              f"FOR VALUES FROM ('{crawl_date}') "
+                              f"TO ('{crawl_date + datetime.timedelta(days=1)}')")
+        _execute(engine, statements)
+        _created.add((engine.url, partition))
+
+
+def _create_texts_table(engine):
+    with _created_lock:
+        if (engine.url, TEXTS_TABLE) in _created:
+            return
+        blob = 'BYTEA' if engine.dialect.name == 'postgresql' else 'BLOB'
+        _execute(engine, [f'CREATE TABLE IF NOT EXISTS {TEXTS_TABLE} (digest TEXT PRIMARY KEY, '
+                          f'size BIGINT NOT NULL, body {blob} NOT NULL)'])
+        _created.add((engine.url, TEXTS_TABLE))
+
+
+def text_digest(text):
+    """
+    text_digest is a function that returns the digest that a text is stored under.
+
+    :param text: str or None
+    :return: sha256 hex digest of utf-8 text or None
+    """
+    if text is None or text != text:
+        return None
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def store_texts(frame, entity, engine):
+    """
+    store_texts is a function that replaces large text columns of an entity
+    (SCHEMA[entity]['texts']) with {column}_digest columns and saves texts that are not
+    in vacancy_texts yet. Only new texts are compressed and sent to the database.
+
+    :param frame: pandas.DataFrame
+    :param entity: table name from SCHEMA
+    :param engine: a sqlalchemy engine
+    :return: pandas.DataFrame with digest columns instead of text columns
+    """
+    names = [name for name in SCHEMA[entity].get('texts', []) if name in frame]
+    if not names:
+        return frame
+    from sqlalchemy import bindparam, text
+
+    _create_texts_table(engine)
+    frame = frame.copy()
+    texts = {}
+    for name in names:
+        digests = frame[name].map(text_digest)
+        # Series.map turns None into NaN, so rows without a text are skipped by notnull
+        present = digests.notnull()
+        texts.update(zip(digests[present], frame[name][present]))
+        frame[f'{name}_digest'] = digests
+    frame = frame.drop(columns=names)
+    if not texts:
+        return frame
+    with engine.begin() as connection:
+        saved = connection.execute(
+            text(f'SELECT digest FROM {TEXTS_TABLE} WHERE digest IN :digests')
+            .bindparams(bindparam('digests', expanding=True)), {'digests': list(texts)})
+        for (digest,) in saved:
+            del texts[digest]
+        if texts:
+            rows = []
+            for digest, body in texts.items():
+                body = body.encode('utf-8')
+                rows.append({'digest': digest, 'size': len(body), 'body': zlib.compress(body, 9)})
+            connection.execute(text(f'INSERT INTO {TEXTS_TABLE} (digest, size, body) '
+                                    f'VALUES (:digest, :size, :body) '
+                                    f'ON CONFLICT (digest) DO NOTHING'), rows)
+    return frame
+
+
+def read_texts(engine, digests):
+    """
+    read_texts is a function that reads texts saved by store_texts.
+
+    :param engine: a sqlalchemy engine
+    :param digests: iterable of digests (None is skipped)
+    :return: dict digest -> str
+    """
+    from sqlalchemy import bindparam, text
+
+    digests = list({digest for digest in digests if digest is not None and digest == digest})
+    if not digests:
+        return {}
+    with engine.connect() as connection:
+        if not engine.dialect.has_table(connection, TEXTS_TABLE):
+            return {}
+        rows = connection.execute(
+            text(f'SELECT digest, body FROM {TEXTS_TABLE} WHERE digest IN :digests')
+            .bindparams(bindparam('digests', expanding=True)), {'digests': digests})
+        return {digest: zlib.decompress(bytes(body)).decode('utf-8') for digest, body in rows}
+
+
+def upsert(frame, entity, engine, crawl_date=None):
+    """
+    upsert is a function that saves rows into an entity table in one transaction.
+    Rows with the primary key of a saved row replace it. Columns that are not in SCHEMA
+    are not saved, missing ones are NULL.
+    PostgreSQL gets the rows with COPY into a temporary table and one INSERT ... ON CONFLICT,
+    other databases get a multi-row INSERT ... ON CONFLICT.
+    Large text columns are saved by store_texts.
+
+    :param frame: pandas.DataFrame or list of dicts
+    :param entity: table name from SCHEMA
+    :param engine: a sqlalchemy engine
+    :param crawl_date: datetime.date of rows without crawl_date (today if None)
+    :return: None
+    """
+    crawl_date = crawl_date or datetime.date.today()
+    frame = store_texts(pd.DataFrame(frame), entity, engine)
+    if 'crawl_date' not in frame:
+        frame['crawl_date'] = crawl_date
+    frame = frame.reindex(columns=columns(entity))
+    key = ['crawl_date'] + SCHEMA[entity]['key']
+    frame = frame.drop_duplicates(key, keep='last')
+    for date in frame.crawl_date.unique():
+        create_schema(engine, entity, pd.Timestamp(date).date())
+    names = ', '.join(frame.columns)
+    updates = ', '.join(f'{name} = excluded.{name}' for name in frame.columns if name not in key)
+    conflict = f'ON CONFLICT ({", ".join(key)}) ' + \
+        (f'DO UPDATE SET {updates}' if updates else 'DO NOTHING')
+    if engine.dialect.name == 'postgresql':
+        _execute_copy(engine, entity, frame, names, conflict)
+        return
+    from sqlalchemy import text
+
+    rows = frame.astype(object).where(frame.notnull(), None)
+    rows['crawl_date'] = rows.crawl_date.map(str)
+    date_columns = [name for name, kind in SCHEMA[entity]['columns'].items() if kind == 'DATE']
+    for name in date_columns:
+        rows[name] = rows[name].map(lambda value: None if value is None else str(value))
+    values = ', '.join(f':{name}' for name in frame.columns)
+    with engine.begin() as connection:
+        connection.execute(text(f'INSERT INTO {entity} ({names}) VALUES ({values}) {conflict}'),
+                           rows.to_dict('records'))
+
+
+def _execute_copy(engine, entity, frame, names, conflict):
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f'CREATE TEMPORARY TABLE {entity}_batch '
+                       f'(LIKE {entity} INCLUDING DEFAULTS) ON COMMIT DROP')
+        cursor.copy_expert(f'COPY {entity}_batch ({names}) FROM STDIN WITH CSV', to_csv(frame))
+        cursor.execute(f'INSERT INTO {entity} ({names}) SELECT {names} FROM {entity}_batch '
+                       f'{conflict}')
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def read_entity(engine, entity, crawl_date=None, texts=False):
+    """
+    read_entity is a function that reads rows of one crawl date from an entity table.
+
+    :param engine: a sqlalchemy engine
+    :param entity: table name from SCHEMA
+    :param crawl_date: datetime.date (today if None)
+    :param texts: if True, large text columns are read from vacancy_texts
+                  (see store_texts), otherwise only their digests are returned
+    :return: pandas.DataFrame without crawl_date column (empty if nothing was saved)
+    """
+    crawl_date = crawl_date or datetime.date.today()
+    with engine.connect() as connection:
+        exists = engine.dialect.has_table(connection, entity)
+    if not exists:
+        return pd.DataFrame(columns=columns(entity)[1:])
+    frame = pd.read_sql(f"SELECT {', '.join(columns(entity)[1:])} FROM {entity} "
+                        f"WHERE crawl_date = '{crawl_date}'", engine)
+    if texts:
+        for name in SCHEMA[entity].get('texts', []):
+            saved = read_texts(engine, frame[f'{name}_digest'])
+            frame[name] = frame[f'{name}_digest'].map(saved)
+    return frame
@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'benchmarks')]
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    """
+    engine is a fixture that runs a test in a temporary directory (crawl state files
+    are created there) and returns a SQLite engine.
+    """
+    from sqlalchemy import create_engine
+
+    monkeypatch.chdir(tmp_path)
+    return create_engine(f'sqlite:///{tmp_path / "test.sqlite3"}')
@@ -0,0 +1,15 @@
+import datetime
+
+from crawl_state import CityRegistry
+
+
+def test_region_ids_that_were_not_cities_are_probed_again(tmp_path):
+    registry = CityRegistry(str(tmp_path / 'state.sqlite3'))
+    registry.record(1, {'city_name': 'Київ', 'city_lat_name': 'kyiv',
+                        'city_link': 'https://www.work.ua/jobs-kyiv/'})
+    registry.record(2)
+    registry.connection.execute("UPDATE work_ua_regions SET probed_at = '2000-01-01 00:00:00'")
+
+    assert registry.ids_to_probe([1, 2, 3]) == [3]
+    assert registry.ids_to_probe([1, 2, 3], non_city_max_age=datetime.timedelta(days=7)) == [2, 3]
+    assert registry.ids_to_probe([1, 2, 3], max_age=datetime.timedelta(days=7)) == [1, 2, 3]
@@ -0,0 +1,47 @@
+from server import StandIn
+
+import djinni_vacancies
+from storage import read_entity
+
+
+def test_interrupted_pipelined_run_is_resumed(engine):
+    with StandIn('djinni', latency=0, djinni_pages=4) as server:
+        vacancies = djinni_vacancies.iter_vacancies(
+            djinni_vacancies.iter_vacancy_links(engine=engine, site_link=server.site_link),
+            engine=engine, site_link=server.site_link)
+        for number, _ in enumerate(vacancies, 1):
+            if number == 12:
+                break
+        vacancies.close()
+        assert len(read_entity(engine, 'djinni_vacancies')) < 60
+
+        for _ in djinni_vacancies.iter_vacancies(
+                djinni_vacancies.iter_vacancy_links(engine=engine, site_link=server.site_link),
+                engine=engine, site_link=server.site_link):
+            pass
+
+    assert len(read_entity(engine, 'djinni_vacancy_links')) == 60
+    assert len(read_entity(engine, 'djinni_vacancies')) == 60
+
+
+def test_streaming_run_keeps_state_only_where_it_is_asked_to(tmp_path, monkeypatch):
+    import os
+
+    from crawl_state import SeenIndex
+    from search_index import VacancyIndex
+
+    monkeypatch.chdir(tmp_path)
+    with StandIn('djinni', latency=0, djinni_pages=2) as server:
+        links = [f'{server.site_link}/jobs/{number}-python-developer/' for number in range(25)]
+        vacancies = list(djinni_vacancies.iter_vacancies(
+            links, batch_size=10, site_link=server.site_link, state_path=None, index_path=None))
+        assert len(vacancies) == 25
+        assert os.listdir(tmp_path) == []
+
+        list(djinni_vacancies.iter_vacancies(
+            links, batch_size=10, site_link=server.site_link,
+            state_path=str(tmp_path / 'state.sqlite3'), index_path=str(tmp_path / 'index.sqlite3')))
+
+    assert len(SeenIndex('djinni', str(tmp_path / 'state.sqlite3')).known(links)) == 25
+    index = VacancyIndex(str(tmp_path / 'index.sqlite3'))
+    assert index.connection.execute('SELECT COUNT(*) FROM documents').fetchone() == (25,)
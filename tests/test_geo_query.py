@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from geo_query import CityIndex, haversine
+
+CITIES = pd.DataFrame({
+    'city_lat_name': ['kyiv', 'brovary', 'irpin', 'bila_tserkva', 'lviv', 'odesa', 'nowhere'],
+    'city_latitude': [50.4501, 50.5110, 50.5218, 49.7968, 49.8397, 46.4825, None],
+    'city_longitude': [30.5234, 30.7909, 30.2505, 30.1311, 24.0297, 30.7233, None],
+})
+
+
+def test_within_and_nearest_find_cities_around_a_point():
+    index = CityIndex(CITIES)
+
+    near_kyiv = index.within(*index.coordinates('kyiv'), radius_km=30)
+    assert list(near_kyiv.city_lat_name) == ['kyiv', 'brovary', 'irpin']
+    assert near_kyiv.distance_km.iloc[0] == 0
+    assert 18 < near_kyiv.distance_km.iloc[-1] < 22
+    assert list(index.nearest(*index.coordinates('lviv'), k=2).city_lat_name) == \
+        ['lviv', 'bila_tserkva']
+    assert len(index.nearest(0.0, 0.0, k=10)) == 6
+
+
+def test_within_matches_a_scan_of_all_cities():
+    generator = np.random.default_rng(7)
+    cities = pd.DataFrame({'city_lat_name': [f'city{number}' for number in range(2000)],
+                           'city_latitude': generator.uniform(-85, 85, 2000),
+                           'city_longitude': generator.uniform(-180, 180, 2000)})
+    index = CityIndex(cities, cell_degrees=1.0)
+
+    for latitude, longitude, radius_km in [(50.45, 30.52, 300), (80.0, 179.5, 500),
+                                           (-60.0, -10.0, 1500), (0.0, 0.0, 50),
+                                           (84.0, 0.0, 400)]:
+        distances = haversine(latitude, longitude, cities.city_latitude.values,
+                              cities.city_longitude.values)
+        expected = set(cities.city_lat_name[distances <= radius_km])
+        found = index.within(latitude, longitude, radius_km).city_lat_name
+        assert len(found) == len(expected) and set(found) == expected
+        nearest = index.nearest(latitude, longitude, k=5)
+        assert list(nearest.city_lat_name) == list(cities.city_lat_name[np.argsort(distances)[:5]])
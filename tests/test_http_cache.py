@@ -0,0 +1,68 @@
+import datetime
+import zlib
+
+from http_cache import ResponseCache
+
+
+def test_expired_responses_are_removed_when_the_cache_is_opened(tmp_path):
+    cache = ResponseCache(str(tmp_path), ttl=datetime.timedelta(days=1))
+    cache.store('https://www.work.ua/jobs/1/', b'old page')
+    cache.connection.execute("UPDATE responses SET fetched_at = '2000-01-01 00:00:00'")
+    cache.connection.commit()
+    cache.store('https://www.work.ua/jobs/2/', b'new page')
+
+    cache = ResponseCache(str(tmp_path), ttl=datetime.timedelta(days=1))
+
+    assert cache.lookup('https://www.work.ua/jobs/1/', fresh=False) is None
+    assert cache.read(cache.lookup('https://www.work.ua/jobs/2/')) == b'new page'
+    assert cache.stored_bytes == len(zlib.compress(b'new page', 6))
+
+
+def test_evict_does_not_remove_bodies_that_are_being_stored(tmp_path):
+    import sys
+    import threading
+
+    cache = ResponseCache(str(tmp_path))
+    stored = threading.Event()
+
+    def evict():
+        while not stored.is_set():
+            cache.evict()
+
+    # threads are switched often, so evict runs in the middle of store
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    evicting = threading.Thread(target=evict)
+    evicting.start()
+    try:
+        for number in range(1000):
+            cache.store(f'https://www.work.ua/jobs/{number}/', f'page {number}'.encode())
+    finally:
+        stored.set()
+        evicting.join()
+        sys.setswitchinterval(switch_interval)
+
+    for number in range(1000):
+        entry = cache.lookup(f'https://www.work.ua/jobs/{number}/')
+        assert cache.read(entry) == f'page {number}'.encode()
+
+
+def test_a_response_without_its_body_is_downloaded_again(tmp_path, monkeypatch):
+    import os
+
+    import fetching
+    from server import StandIn
+
+    monkeypatch.chdir(tmp_path)
+    cache = ResponseCache(str(tmp_path / 'cache'))
+    with StandIn('work_ua', latency=0) as server:
+        url = f'{server.site_link}/jobs-kyiv/'
+        fetching.use_cache(cache)
+        try:
+            content = fetching.fetch(url)
+            os.remove(cache._path(cache.lookup(url)['digest']))
+            assert fetching.fetch(url) == content
+            fetching.use_cache(cache, offline=True)
+            assert fetching.fetch(url) == content
+        finally:
+            fetching.use_cache(None)
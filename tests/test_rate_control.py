@@ -0,0 +1,18 @@
+from rate_control import HostController
+
+
+def test_rate_grows_with_time_not_with_responses(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr('rate_control.time.monotonic', lambda: now[0])
+    controller = HostController('example.com', min_rate=0.2, increase=2.0)
+    controller.failure(throttled=True)
+    controller.rate = controller.min_rate
+    for _ in range(10):
+        controller.waited = True
+        controller.success(0.01)
+    assert controller.rate == controller.min_rate
+
+    now[0] += 0.5
+    controller.waited = True
+    controller.success(0.01)
+    assert abs(controller.rate - (controller.min_rate + 1.0)) < 1e-9
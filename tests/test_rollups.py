@@ -0,0 +1,21 @@
+import datetime
+
+from rollups import read_rollups, update_rollups
+
+
+def vacancy(vacancy_id, city, salary):
+    return {'vacancy_id': vacancy_id, 'vacancy_salary': salary, 'vacancy_city': city,
+            'vacancy_category': 'it', 'publication_date': datetime.date(2019, 2, 22)}
+
+
+def test_rollups_count_every_vacancy_once(engine):
+    batch = [vacancy('1', 'kyiv', 10000), vacancy('2', 'kyiv', 30000),
+             vacancy('3', 'kyiv', None), vacancy('1', 'lviv', 20000)]
+    assert update_rollups(batch, engine) == 4
+    assert update_rollups(batch, engine) == 0
+
+    rollups = read_rollups(engine, by=['vacancy_city'], quantiles=(0.5,)).set_index('vacancy_city')
+    assert rollups.loc['kyiv', 'vacancies'] == 3
+    assert rollups.loc['kyiv', 'salaries'] == 2
+    assert rollups.loc['kyiv', 'mean_salary'] == 20000
+    assert abs(rollups.loc['lviv', 'salary_p50'] - 20000) <= 200
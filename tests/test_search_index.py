@@ -0,0 +1,45 @@
+import datetime
+
+from search_index import VacancyIndex
+
+VACANCIES = [
+    {'vacancy_link': '/jobs/1/', 'position': 'Senior Data Engineer', 'city': 'Киев',
+     'specialization': 'Python', 'published_date': datetime.date(2019, 2, 1),
+     'descriptions': 'Machine learning pipelines in Python and Kubernetes'},
+    {'vacancy_link': '/jobs/2/', 'position': 'Junior Data Engineer', 'city': 'Киев',
+     'specialization': 'Scala', 'published_date': datetime.date(2019, 2, 20),
+     'descriptions': 'Learning machine code, Scala and Kubernetes'},
+    {'vacancy_link': '/jobs/3/', 'position': 'C++ Developer', 'city': 'Львов',
+     'specialization': 'C++', 'published_date': datetime.date(2019, 3, 5),
+     'descriptions': 'Розробка на C++, досвід з Linux. Знання англійської мови'},
+]
+
+
+def count(index, query, **arguments):
+    return int(index.count(query, **arguments)['count'].sum())
+
+
+def test_count_phrase_boolean_and_cyrillic_queries(tmp_path):
+    index = VacancyIndex(str(tmp_path / 'index.sqlite3'))
+    assert index.add(VACANCIES) == 3
+
+    assert count(index, 'kubernetes') == 2
+    assert count(index, '"machine learning"') == 1
+    assert count(index, '"data engineer" NOT junior') == 1
+    assert count(index, '(python OR scala) AND kubernetes') == 2
+    assert count(index, '"c++"') == 1
+    assert count(index, 'розробка') == count(index, 'РОЗРОБКА') == 1
+    assert count(index, 'англ*') == 1
+    assert count(index, 'kubernetes', city='Киев', since=datetime.date(2019, 2, 10)) == 1
+    by_month = index.count('engineer OR developer', by=['month'])
+    assert dict(zip(by_month.month, by_month['count'])) == {'2019-02': 2, '2019-03': 1}
+
+
+def test_indexing_a_vacancy_again_replaces_it(tmp_path):
+    index = VacancyIndex(str(tmp_path / 'index.sqlite3'))
+    index.add(VACANCIES)
+    index.add([dict(VACANCIES[0], descriptions='Go and Rust')])
+
+    assert count(index, 'kubernetes') == 1
+    assert count(index, 'rust') == 1
+    assert index.links('rust') == ['/jobs/1/']
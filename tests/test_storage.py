@@ -0,0 +1,55 @@
+import datetime
+
+import pandas as pd
+
+import storage
+
+
+def test_upsert_replay_does_not_duplicate_rows(engine):
+    rows = [{'vacancy_id': str(number), 'vacancy_city': 'kyiv', 'vacancy_category': 'it',
+             'vacancy_title': f'title {number}', 'publication_date': datetime.date(2019, 2, 22)}
+            for number in range(5)]
+    storage.upsert(rows, 'work_ua_vacancies', engine)
+    rows[0]['vacancy_title'] = 'changed'
+    storage.upsert(rows, 'work_ua_vacancies', engine)
+
+    saved = storage.read_entity(engine, 'work_ua_vacancies')
+    assert len(saved) == 5
+    assert saved.set_index('vacancy_id').at['0', 'vacancy_title'] == 'changed'
+
+
+def test_vacancies_are_looked_up_across_days_by_index(engine):
+    from sqlalchemy import text
+
+    for day in (21, 22):
+        storage.upsert([{'vacancy_link': '/jobs/1/', 'specialization': 'Python'}],
+                       'djinni_vacancies', engine, datetime.date(2019, 2, day))
+        storage.upsert([{'vacancy_id': '1', 'vacancy_city': 'kyiv', 'vacancy_category': 'it'}],
+                       'work_ua_vacancies', engine, datetime.date(2019, 2, day))
+
+    queries = {
+        'djinni_vacancies_vacancy_link': "djinni_vacancies WHERE vacancy_link = '/jobs/1/'",
+        'djinni_vacancies_specialization': "djinni_vacancies WHERE specialization = 'Python'",
+        'work_ua_vacancies_vacancy_id': "work_ua_vacancies WHERE vacancy_id = '1'"}
+    with engine.connect() as connection:
+        for index, query in queries.items():
+            assert len(connection.execute(text(f'SELECT * FROM {query}')).fetchall()) == 2
+            plan = connection.execute(text(f'EXPLAIN QUERY PLAN SELECT * FROM {query}'))
+            assert index in ' '.join(row[-1] for row in plan)
+
+
+def test_texts_with_none_are_stored_and_read_back(engine):
+    company = 'Компанія, що робить продукти ' * 50
+    rows = [{'vacancy_link': '/jobs/1/', 'descriptions': 'Python, SQL', 'about_company': company},
+            {'vacancy_link': '/jobs/2/', 'descriptions': 'Go', 'about_company': None},
+            {'vacancy_link': '/jobs/3/', 'descriptions': None, 'about_company': company}]
+    storage.upsert(rows, 'djinni_vacancies', engine)
+
+    saved = storage.read_entity(engine, 'djinni_vacancies', texts=True).set_index('vacancy_link')
+    assert saved.at['/jobs/1/', 'descriptions'] == 'Python, SQL'
+    assert saved.at['/jobs/1/', 'about_company'] == company
+    assert saved.at['/jobs/3/', 'about_company'] == company
+    assert saved.at['/jobs/2/', 'descriptions'] == 'Go'
+    assert pd.isnull(saved.at['/jobs/2/', 'about_company_digest'])
+    assert pd.isnull(saved.at['/jobs/3/', 'descriptions_digest'])
+    assert len(storage.read_texts(engine, saved.about_company_digest)) == 1
@@ -0,0 +1,46 @@
+from server import StandIn
+
+import work_ua_vacancies
+
+
+def test_incremental_crawl_remembers_vacancies_per_city_and_category(engine):
+    with StandIn('work_ua', latency=0, work_ua_pages=3) as server:
+        kyiv = list(work_ua_vacancies.iter_vacancies(['kyiv'], ['it'], incremental=True,
+                                                     site_link=server.site_link))
+        # the stand-in lists the same vacancies in every city
+        lviv = list(work_ua_vacancies.iter_vacancies(['lviv'], ['it'], incremental=True,
+                                                     site_link=server.site_link))
+        again = list(work_ua_vacancies.iter_vacancies(['kyiv'], ['it'], incremental=True,
+                                                      site_link=server.site_link))
+
+    assert len(kyiv) == len(lviv) == 48
+    assert again == []
+
+
+def test_pagination_goes_on_when_the_number_of_vacancies_is_too_low(engine):
+    # 20 vacancies are 2 pages of 14 regular cards, but there are 5 full pages
+    with StandIn('work_ua', latency=0, work_ua_pages=5, work_ua_total=20) as server:
+        vacancies = list(work_ua_vacancies.iter_vacancies(['kyiv'], ['it'],
+                                                          site_link=server.site_link))
+
+    assert len(vacancies) == 5 * 16
+
+
+
+def crawl(prefetch=2, **config):
+    with StandIn('work_ua', latency=0, **config) as server:
+        vacancies = list(work_ua_vacancies.iter_vacancies(['kyiv'], ['it'], prefetch=prefetch,
+                                                          site_link=server.site_link))
+    return len(vacancies), server.requests
+
+
+def test_pagination_does_not_request_pages_after_the_estimated_last_one(engine):
+    # every page has 2 hot cards and up to 14 regular ones
+    assert crawl(work_ua_vacancies=5) == (7, 1)
+    assert crawl(work_ua_vacancies=4 * 14 + 5) == (4 * 16 + 7, 5)
+    assert crawl(work_ua_vacancies=5 * 14) == (5 * 16, 6)
+    # the pages that are requested do not depend on prefetch, so a crawl can be replayed
+    # from http_cache with another prefetch
+    for prefetch in (1, 4):
+        assert crawl(prefetch, work_ua_vacancies=4 * 14 + 5) == (4 * 16 + 7, 5)
+        assert crawl(prefetch, work_ua_pages=5, work_ua_total=20) == (5 * 16, 6)
@@ -1,6 +1,12 @@
 """
 It is a script that has functions to parse work.ua site.
 """
+import datetime
+import re
+import time
+
+SITE_LINK = 'https://www.work.ua'
+NON_CITY_MAX_AGE = datetime.timedelta(days=7)
 
 
 def connect_to_database(host=False, database=False, username=False, password=False):
@@ -29,102 +35,173 @@ def connect_to_database(host=False, database=False, username=False, password=Fal
     return create_engine(f'postgresql://{username}:{password}@{host}/{database}')
 
 
-def get_cities():
+def parse_city_page(content):
+    """
+    parse_city_page is a function to parse a page of work.ua region.
+
+    :param content: raw page content
+    :return: dict with city_name, city_lat_name and city_link or None if it is not a city page
+    """
+    from extraction import WORK_UA_CITY, extract
+    from metrics import REGISTRY
+
+    with REGISTRY.timed('parse', 'work_ua.get_cities'):
+        results_page = extract(WORK_UA_CITY, content)
+    if not results_page['city_page']:
+        return None
+    city_link = results_page['city_link']
+    with REGISTRY.timed('normalize', 'work_ua.get_cities'):
+        return {"city_name": results_page['city_name'],
+                "city_lat_name": re.search(r'/jobs-([^/]+)/', city_link).group(1),
+                "city_link": city_link}
+
+
+def get_cities(batch_size=1000, flush_interval=30, workers=16, region_ids=range(0, 1000),
+               max_age=None, engine=None, site_link=SITE_LINK, processes=0,
+               non_city_max_age=NON_CITY_MAX_AGE):
     """
     get_cities is a function that parse work.ua site to get cities for parsing vacancies.
-    It saves information about cities like:
+    Region ids are probed concurrently and results are kept in a local registry,
+    so next runs only probe ids that were never probed (or are older than max_age)
+    and ids that were not cities a week ago (non_city_max_age), to find new cities.
+    Coordinates come from the local geocode cache (see geocoding.geocode_cities).
+    It saves information about cities (work_ua_cities table, see storage.py) like:
+    - city_id           work.ua region id. Example: "1"
     - city_name         name of city or town. Example: "Київ"
     - city_lat_name     name of city or town using Latin alphabet. Example: "kyiv"
     - city_link         url. Example: "https://www.work.ua/jobs-kyiv/"
     - city_latitude     latitude. Example: "50.4501071"
     - city_longitude    longitude. Example: "30.5240501"
 
+    :param batch_size: number of cities that are saved into database at once
+    :param flush_interval: number of seconds after which parsed cities are saved
+                           when the next one is parsed (see sink.BufferedWriter)
+    :param workers: number of region pages that are downloaded at the same time
+    :param region_ids: work.ua region ids to look for cities
+    :param max_age: datetime.timedelta, region ids that were probed earlier are probed again.
+                    Example: datetime.timedelta(days=30). None means never.
+    :param engine: a sqlalchemy engine (connect_to_database() asks for connection data if None)
+    :param site_link: work.ua address
+    :param processes: number of processes that parse pages (see pipeline.ParsePool),
+                      0 means pages are parsed by the downloading threads
+    :param non_city_max_age: datetime.timedelta, region ids that were not cities are probed
+                             again after it. None means max_age is used for them too.
     :return: list of cities from work.ua (city_lat_name)
     """
-    import requests
-    import pandas as pd
-    from bs4 import BeautifulSoup
-    from time import time
-    import datetime
-    from geopy.geocoders import Nominatim
-    from ll import ll
-
-    site_link = "https://www.work.ua"
-    engine = connect_to_database()
-    start = time()
-    for i in range(0, 1000):
-        start_page = time()
-        url = f"{site_link}/jobs/?region={i}advs=1"
-        response = requests.get(url)
-        results_page = BeautifulSoup(response.content, 'lxml')
-        if results_page.find('h1', id="cityPage") is not None:
-            city_id = i
-            city_link = results_page.find('meta', property="og:url").get('content')
-            city_name = results_page.find('input', id="city").get('value')
-            city_lat_name = city_link[25:-1]
-            if city_lat_name in ll:
-                city_latitude = ll[city_lat_name]['city_latitude']
-                city_longitude = ll[city_lat_name]['city_longitude']
-                print(city_lat_name, city_latitude, city_longitude)
-            else:
-                geolocator = Nominatim()
-                location = geolocator.geocode(city_lat_name.replace("_", " "), timeout=10)
-                if location is not None:
-                    city_latitude = location.latitude
-                    city_longitude = location.longitude
-                else:
-                    location = geolocator.geocode(city_name, timeout=10)
-                    if location is None:
-                        city_latitude = None
-                        city_longitude = None
-                    else:
-                        city_latitude = location.latitude
-                        city_longitude = location.longitude
-            cities_dict = {"city_id": city_id,
-                           "city_name": city_name,
-                           "city_lat_name": city_lat_name,
-                           "city_link": city_link,
-                           "city_latitude": city_latitude,
-                           "city_longitude": city_longitude}
-            cities = pd.DataFrame(cities_dict, index=[0])
-            cities.to_sql(f'city_work_ua_{datetime.date.today()}', engine, if_exists='append')
-            print(i, city_name, time() - start_page, datetime.datetime.now())
-        else:
-            print(i, None, time() - start_page, datetime.datetime.now())
-    print(time() - start)
-    sql_query_city = f'SELECT * FROM public."city_work_ua_{datetime.date.today()}"'
-    cities_list = pd.read_sql(sql_query_city, engine)
-    city_lat_name_list = list(cities_list.city_lat_name)
-    return city_lat_name_list
+    if engine is None:
+        engine = connect_to_database()
+    start = time.time()
+    cities = [city['city_lat_name']
+              for city in iter_cities(batch_size, flush_interval, workers, region_ids, max_age,
+                                      engine, site_link, processes, non_city_max_age)]
+    print(f'{len(cities)} cities were saved to work_ua_cities, it took {time.time() - start}')
+    return cities
+
+
+def iter_cities(batch_size=1000, flush_interval=30, workers=16, region_ids=range(0, 1000),
+                max_age=None, engine=None, site_link=SITE_LINK, processes=0,
+                non_city_max_age=NON_CITY_MAX_AGE):
+    """
+    iter_cities is a generator of work.ua cities (see get_cities).
+    Cities that are already in the local registry are yielded first, then cities that are
+    found by probing region ids, as soon as a batch of them is geocoded.
+    If engine is given, cities are also saved in SQL database.
+
+    :param batch_size: number of cities that are geocoded, saved and yielded at once
+    :param flush_interval: number of seconds after which parsed cities are saved
+                           when the next one is parsed (see sink.BufferedWriter)
+    :param workers: number of region pages that are downloaded at the same time
+    :param region_ids: work.ua region ids to look for cities
+    :param max_age: datetime.timedelta, region ids that were probed earlier are probed again
+    :param engine: a sqlalchemy engine or None if cities are not saved
+    :param site_link: work.ua address
+    :param processes: number of processes that parse pages (see pipeline.ParsePool),
+                      0 means pages are parsed by the downloading threads
+    :param non_city_max_age: datetime.timedelta, region ids that were not cities are probed
+                             again after it
+    :return: generator of dicts with city_id, city_name, city_lat_name, city_link,
+             city_latitude and city_longitude
+    """
+    from functools import partial
+    from crawl_state import CityRegistry
+    from fetching import fetch_pages
+    from geocoding import geocode_cities
+    from pipeline import ParsePool
+    from sink import BufferedWriter
+    from storage import upsert
 
+    registry = CityRegistry()
+    urls = {f"{site_link}/jobs/?region={i}&advs=1": i
+            for i in registry.ids_to_probe(region_ids, max_age, non_city_max_age)}
 
-def get_categories():
+    def found_cities():
+        probed = set(urls.values())
+        yield from (city for city in registry.cities() if city['city_id'] not in probed)
+        with ParsePool(processes) as pool:
+            def parse(url, content):
+                return pool.submit(parse_city_page, content)
+
+            for url, city in fetch_pages(urls, workers=workers, entry_point='work_ua.get_cities',
+                                         transform=parse):
+                registry.record(urls[url], city)
+                if city is not None:
+                    yield dict(city_id=urls[url], **city)
+
+    writer = None
+    if engine is not None:
+        writer = BufferedWriter(engine, 'work_ua_cities', batch_size=batch_size,
+                                flush_interval=flush_interval, entry_point='work_ua.get_cities',
+                                save=partial(upsert, crawl_date=datetime.date.today()))
+    chunk = []
+    try:
+        for city in found_cities():
+            chunk.append(city)
+            if len(chunk) >= batch_size:
+                chunk = geocode_cities(chunk)
+                if writer is not None:
+                    writer.write_many(chunk)
+                yield from chunk
+                chunk = []
+        if chunk:
+            chunk = geocode_cities(chunk)
+            if writer is not None:
+                writer.write_many(chunk)
+            yield from chunk
+    finally:
+        if writer is not None:
+            writer.flush()
+
+
+def get_categories(engine=None, site_link=SITE_LINK):
     """
     get_categories is a function that parse work.ua site to get categories for parsing vacancies.
-    It saves information about categories like:
-    - category_names         name of category. Example: "IT, комп'ютери, інтернет"
-    - category_links         url. Example: "https://www.work.ua/jobs-kyiv-it/"
-    - category_values        like id. Example: "1"
-    - category_lat_names     name of city or town using Latin alphabet. Example: "it"
+    It saves information about categories (work_ua_categories table, see storage.py) like:
+    - category_name          name of category. Example: "IT, комп'ютери, інтернет"
+    - category_link          url. Example: "https://www.work.ua/jobs-kyiv-it/"
+    - category_value         like id. Example: "1"
+    - category_lat_name      name of category using Latin alphabet. Example: "it"
 
+    :param engine: a sqlalchemy engine (connect_to_database() asks for connection data if None)
+    :param site_link: work.ua address
     :return: list of categories from work.ua (category_lat_names)
     """
-    import requests
     import pandas as pd
-    import datetime
-    from bs4 import BeautifulSoup
+    from extraction import WORK_UA_CATEGORIES, extract
+    from fetching import fetch
+    from metrics import REGISTRY
+    from storage import upsert
 
-    site_link = "https://www.work.ua"
+    entry_point = 'work_ua.get_categories'
     url = f"{site_link}/jobs-kyiv/?advs=1"
-    postgres_engine = connect_to_database()
-    response = requests.get(url)
-    page = BeautifulSoup(response.content, 'lxml')
-    all_filters = page.find_all('a', class_="filter-link catlink")
-    all_checkbox = page.find('div', id="category_selection").find_all('input', type="checkbox")
-    category_names = list(map(lambda j: j.get_text(), all_filters))
-    category_links = list(map(lambda j: f"{site_link}{j.get('href')}", all_filters))
-    category_values = list(map(lambda j: j.get("value"), all_checkbox))
-    category_lat_names = list(map(lambda j: j[30:-1], category_links))
+    postgres_engine = engine if engine is not None else connect_to_database()
+    content = fetch(url, entry_point)
+    with REGISTRY.timed('parse', entry_point):
+        page = extract(WORK_UA_CATEGORIES, content)
+    category_names = page['category_names']
+    category_links = list(map(lambda j: f"{site_link}{j}", page['category_links']))
+    category_values = page['category_values']
+    category_lat_names = list(map(lambda j: re.search(r'/jobs-kyiv-([^/]+)/', j).group(1),
+                                  category_links))
     categories_dict = {
         "category_value": category_values,
         "category_name": category_names,
@@ -132,16 +209,317 @@ def get_categories():
         "category_lat_name": category_lat_names
     }
     categories = pd.DataFrame.from_dict(categories_dict)
-    categories.to_sql(f'category_list_work_ua{datetime.date.today()}',
-                      postgres_engine,
-                      if_exists='replace')
+    with REGISTRY.timed('write', entry_point):
+        upsert(categories, 'work_ua_categories', postgres_engine)
+    REGISTRY.inc('rows_written_total', len(categories), entry_point=entry_point)
     return list(categories.category_lat_name)
 
 
-def get_vacancies(cities=('kyiv',), categories=('it',)):
+def read_listing_page(content, city, category_lat_name, site_link=SITE_LINK):
+    """
+    read_listing_page is a function to parse one page of vacancy list together with
+    the number of vacancies that the page reports for the whole city/category
+    and the number of regular (not hot) vacancy cards on the page.
+
+    :param content: raw page content
+    :param city: current city
+    :param category_lat_name: current category
+    :param site_link: work.ua address
+    :return: (vacancies, total, page_size): vacancies is a list of dicts (see get_vacancies)
+             or None if it is the page after the last one, total is int or None if the page
+             does not report it, page_size is the number of regular cards
+    """
+    from extraction import WORK_UA_LISTING, extract, parse_date
+    from metrics import REGISTRY
+
+    entry_point = 'work_ua.get_vacancies'
+    empty_page = 'За вашим запитом з вибраними фільтрами вакансій поки немає.'
+    with REGISTRY.timed('parse', entry_point):
+        results_page = extract(WORK_UA_LISTING, content)
+    if results_page['first_bold'] == empty_page:
+        return None, 0, 0
+    start = time.perf_counter()
+    total = None
+    if results_page['total'] is not None:
+        digits = re.sub(r'\D', '', results_page['total'])
+        total = int(digits) if digits else None
+    vacancies = []
+    page_size = 0
+    for card in results_page['cards']:
+        if card['link'] is None:
+            continue
+        page_size += 'js-hot-block' not in (card['classes'] or '')
+        vacancy_id = re.search(r'/jobs/(\d+)/', card['link'])
+        vacancy_title, _, published = (card['link_title'] or '').partition(', вакансія від ')
+        salary = re.search(r'\d+', (card['salary'] or '').replace(' ', ''))
+        vacancies.append({
+            "vacancy_id": None if vacancy_id is None else vacancy_id.group(1),
+            "vacancy_link": f'{site_link}{card["link"]}',
+            "vacancy_title": vacancy_title or None,
+            "company_title": card['company_title'],
+            "vacancy_salary": None if salary is None else int(salary.group()),
+            "publication_date": parse_date(published),
+            "vacancy_city": city,
+            "vacancy_category": category_lat_name})
+    REGISTRY.observe('stage_seconds', time.perf_counter() - start,
+                     entry_point=entry_point, stage='normalize')
+    return vacancies, total, page_size
+
+
+def parse_listing_page(content, city, category_lat_name, site_link=SITE_LINK):
+    """
+    parse_listing_page is a function to parse all cards with vacancy info from one page of
+    vacancy list.
+
+    :param content: raw page content
+    :param city: current city
+    :param category_lat_name: current category
+    :param site_link: work.ua address
+    :return: list of dicts with information about vacancies (see get_vacancies)
+             or None if it is the page after the last one
+    """
+    return read_listing_page(content, city, category_lat_name, site_link)[0]
+
+
+def crawl_listings(pairs, workers=8, prefetch=2, site_link=SITE_LINK, saved=frozenset(),
+                   keep=None, processes=0):
+    """
+    crawl_listings is a generator that paginates many city/category pairs at the same time.
+    Pages of all pairs are downloaded by workers threads and parsed by them or by
+    the process pool (no more than workers * 2 pages are downloaded or parsed at once,
+    requests to work.ua also wait for the host controller of fetching.fetch).
+    While a page of a pair is handled, up to prefetch next pages of the pair are already
+    being downloaded.
+
+    The last page of a pair is estimated from the number of vacancies on its first page
+    and the number of regular cards on it, and no page after it is prefetched.
+    A pair with no more vacancies than the first page has stops on the first page.
+    Otherwise the estimate is trusted only if the last page has fewer regular cards than
+    the first one, so the empty page after it is not requested. If it is full (the number
+    is too low or pages got bigger), the next pages are requested one at a time until
+    a short or the empty page. If the first page does not report the number,
+    pagination stops on the empty page like before.
+
+    Pages in saved are not handled again and only the first one is downloaded
+    (for the number of vacancies), so an interrupted crawl can be resumed.
+
+    :param pairs: iterable of (city, category), it is consumed lazily
+    :param workers: number of pages that are downloaded at the same time
+    :param prefetch: number of pages of a pair that are downloaded ahead of the handled one
+    :param site_link: work.ua address
+    :param saved: set of (city, category, page number) of pages that were already handled
+    :param keep: function(city, category, page number, vacancies) that is called before
+                 a page is yielded and returns vacancies to yield or None to stop
+                 pagination of the pair
+    :param processes: number of processes that parse pages (see pipeline.ParsePool),
+                      0 means pages are parsed by the downloading threads
+    :return: generator of (city, category, page number, vacancies) for every page of a pair
+             in page order and (city, category, None, None) when pagination of the pair ends
+    """
+    import math
+    from collections import deque
+    from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+    from fetching import fetch
+    from pipeline import ParsePool
+
+    def load(pair, page_number):
+        city, category = pair
+        url = f"{site_link}/jobs-{city}-{category}/?page={page_number}"
+        content = fetch(url, 'work_ua.get_vacancies')
+        return pool.submit(read_listing_page, content, city, category, site_link)
+
+    pairs = iter(pairs)
+    pages = []
+    follow_ups = deque()
+    crawls = {}
+    pending = {}
+
+    def handle(pair):
+        crawl = crawls[pair]
+        while not crawl['stopped'] and crawl['handled'] + 1 in crawl['ready']:
+            crawl['handled'] += 1
+            page_number = crawl['handled']
+            vacancies, total, page_size = crawl['ready'].pop(page_number)
+            if vacancies is None:
+                crawl['stopped'] = True
+                break
+            if page_number == 1:
+                crawl['page_size'] = page_size
+                if total is not None and page_size:
+                    crawl['last_page'] = max(math.ceil(total / page_size), 1)
+            if pair + (page_number,) not in saved:
+                if keep is not None:
+                    vacancies = keep(pair[0], pair[1], page_number, vacancies)
+                if vacancies is None:
+                    crawl['stopped'] = True
+                else:
+                    pages.append(pair + (page_number, vacancies))
+            if page_number == crawl['last_page']:
+                if page_number == 1 or (page_size is not None
+                                        and page_size < crawl['page_size']):
+                    crawl['stopped'] = True
+                else:
+                    # a full page: the estimate was too low, the next page is requested
+                    # only after this one, so no page after the empty one is requested
+                    crawl['last_page'] += 1
+            if not crawl['stopped']:
+                window = crawl['handled'] + prefetch
+                if crawl['last_page'] is not None:
+                    window = min(window, crawl['last_page'])
+                while crawl['requested'] < window:
+                    crawl['requested'] += 1
+                    if pair + (crawl['requested'],) in saved:
+                        crawl['ready'][crawl['requested']] = [], None, None
+                    else:
+                        follow_ups.append((pair, crawl['requested']))
+        if crawl['stopped']:
+            crawl['ready'].clear()
+            if not crawl['finished']:
+                crawl['finished'] = True
+                pages.append(pair + (None, None))
+            if not crawl['in_flight']:
+                del crawls[pair]
+
+    def submit(executor):
+        while follow_ups:
+            pair, page_number = follow_ups.popleft()
+            if pair in crawls and not crawls[pair]['stopped']:
+                break
+        else:
+            pair = next(pairs, None)
+            if pair is None:
+                return False
+            page_number = 1
+            crawls[pair] = {'requested': 1, 'handled': 0, 'in_flight': 0, 'last_page': None,
+                            'page_size': None, 'ready': {}, 'stopped': False,
+                            'finished': False}
+        crawls[pair]['in_flight'] += 1
+        pending[executor.submit(load, pair, page_number)] = pair, page_number
+        return True
+
+    with ParsePool(processes) as pool, ThreadPoolExecutor(max_workers=workers) as executor:
+        while len(pending) < workers * 2 and submit(executor):
+            pass
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pair, page_number = pending.pop(future)
+                result = future.result()
+                if isinstance(result, Future):
+                    # the page is being parsed by the pool, the thread is free again
+                    pending[result] = pair, page_number
+                    continue
+                crawl = crawls[pair]
+                crawl['in_flight'] -= 1
+                if crawl['stopped']:
+                    if not crawl['in_flight']:
+                        del crawls[pair]
+                    continue
+                crawl['ready'][page_number] = result
+                handle(pair)
+            yield from pages
+            pages.clear()
+            while len(pending) < workers * 2 and submit(executor):
+                pass
+
+
+def iter_vacancies(cities=('kyiv',), categories=('it',), batch_size=1000, flush_interval=30,
+                   incremental=False, engine=None, site_link=SITE_LINK, workers=8, prefetch=2,
+                   resume=True, processes=0):
+    """
+    iter_vacancies is a generator of work.ua vacancies (see get_vacancies).
+    Vacancies are yielded page by page as soon as they are parsed and cities are read lazily,
+    so iter_vacancies(iter_cities(), categories) starts before all cities are found.
+    Memory does not grow with the number of vacancies.
+    If engine is given, vacancies are also saved in SQL database and added to
+    salary and volume rollups after every saved batch (see rollups.py).
+
+    :param cities: iterable of city_lat_name or of dicts with city_lat_name
+    :param categories: list of categories
+    :param batch_size: number of vacancies that are saved into database at once
+    :param flush_interval: number of seconds after which parsed vacancies are saved
+                           when the next one is parsed (see sink.BufferedWriter)
+    :param incremental: if True, vacancies that were already scraped under the same
+                        city/category are skipped and pagination of a city/category stops
+                        on the first page that has only such vacancies (a vacancy is listed
+                        under many cities/categories, so they are remembered per pair)
+    :param engine: a sqlalchemy engine or None if vacancies are not saved
+    :param site_link: work.ua address
+    :param workers: number of listing pages that are downloaded at the same time
+    :param prefetch: number of pages of a city/category that are downloaded ahead
+    :param resume: if True, pages and cities/categories that were saved by an interrupted run
+                   of the same day are not downloaded again (only with engine,
+                   see crawl_state.CrawlJournal)
+    :param processes: number of processes that parse pages (see pipeline.ParsePool),
+                      0 means pages are parsed by the downloading threads
+    :return: generator of dicts with information about vacancies
+    """
+    from functools import partial
+    from crawl_state import CrawlJournal, SeenIndex
+    from rollups import update_rollups
+    from sink import BufferedWriter
+    from storage import upsert
+
+    seen = SeenIndex('work_ua')
+    writer = None
+    saved = set()
+
+    def seen_key(vacancy):
+        return f"{vacancy['vacancy_id']}/{vacancy['vacancy_city']}/{vacancy['vacancy_category']}"
+
+    def mark_seen(rows):
+        seen.mark_seen(seen_key(row) for row in rows)
+
+    def after_save(rows):
+        update_rollups(rows, engine)
+        mark_seen(rows)
+
+    if engine is not None:
+        journal = CrawlJournal(engine, 'work_ua_vacancies', datetime.date.today())
+        if not resume:
+            journal.clear()
+        saved = {tuple(unit.split('/')) for unit in journal.recover()}
+        saved = {(unit[0], unit[1], int(unit[2])) if len(unit) == 3 else unit for unit in saved}
+        writer = BufferedWriter(engine, journal.table, batch_size=batch_size,
+                                flush_interval=flush_interval, on_flush=after_save,
+                                entry_point='work_ua.get_vacancies', journal=journal,
+                                save=partial(upsert, crawl_date=journal.crawl_date))
+
+    def keep_new(city_name, category, page_number, vacancies):
+        known_keys = seen.known(seen_key(vacancy) for vacancy in vacancies)
+        seen.touch(known_keys)
+        if vacancies and len(known_keys) == len(vacancies):
+            return None
+        return [vacancy for vacancy in vacancies if seen_key(vacancy) not in known_keys]
+
+    cities = (city['city_lat_name'] if isinstance(city, dict) else city for city in cities)
+    pairs = ((city_name, category) for city_name in cities for category in categories
+             if (city_name, category) not in saved)
+    try:
+        for city_name, category, page_number, vacancies in crawl_listings(
+                pairs, workers=workers, prefetch=prefetch, site_link=site_link, saved=saved,
+                keep=keep_new if incremental else None, processes=processes):
+            if page_number is None:
+                if writer is not None:
+                    writer.write_many([], unit=f'{city_name}/{category}')
+                continue
+            if writer is not None:
+                writer.write_many(vacancies, unit=f'{city_name}/{category}/{page_number}')
+            yield from vacancies
+            if writer is None:
+                mark_seen(vacancies)
+    finally:
+        if writer is not None:
+            writer.flush()
+
+
+def get_vacancies(cities=('kyiv',), categories=('it',), batch_size=1000, flush_interval=30,
+                  incremental=False, engine=None, site_link=SITE_LINK, workers=8, prefetch=2,
+                  resume=True, processes=0):
     """
     get_vacancies is a function that parse work.ua site to get information about vacancies
-    and save the data into database. It saves information about vacancies like:
+    and save the data into database (work_ua_vacancies table, see storage.py).
+    It saves information about vacancies like:
     - vacancy_id            Example: '3430955'
     - vacancy_link          Example: 'https://www.work.ua/jobs/3430955/'
     - vacancy_title         Example: 'Big Data Architect'
@@ -156,95 +534,30 @@ def get_vacancies(cities=('kyiv',), categories=('it',)):
 
     :param categories: list of categories (default value is "it").
                        Use get_categories() function to get list of all categories.
+    :param batch_size: number of vacancies that are saved into database at once
+    :param flush_interval: number of seconds after which parsed vacancies are saved
+                           when the next one is parsed (see sink.BufferedWriter)
+    :param incremental: if True, vacancies that were already scraped under the same
+                        city/category are not saved
+                        and pagination of a city/category stops on the first page
+                        that has only such vacancies
+    :param engine: a sqlalchemy engine (connect_to_database() asks for connection data if None)
+    :param site_link: work.ua address
+    :param workers: number of listing pages that are downloaded at the same time
+                    (city/category pairs are crawled in parallel, see crawl_listings)
+    :param prefetch: number of pages of a city/category that are downloaded ahead
+    :param resume: if True, pages and cities/categories that were saved by an interrupted run
+                   of the same day are not downloaded again (see crawl_state.CrawlJournal),
+                   if False, the run starts from the beginning
+    :param processes: number of processes that parse pages (see pipeline.ParsePool),
+                      0 means pages are parsed by the downloading threads
     :return: pandas.DataFrame with information about vacancies
     """
-    import requests
-    import pandas as pd
-    import datetime
-    from bs4 import BeautifulSoup
+    from storage import read_entity
 
-    site_link = 'https://www.work.ua'
-    cards1 = "card card-hover card-visited wordwrap job-link js-hot-block"
-    cards2 = "card card-hover card-visited wordwrap job-link"
-    sal = "nowrap"
-    empty_page = 'За вашим запитом з вибраними фільтрами вакансій поки немає.'
-    postgres_engine = connect_to_database()
-
-    def parse_cards(all_cards, city, category_lat_name):
-        """
-        parse_card is a function to parse all cards with vacancy info that is got from web page.
-
-        :param all_cards: list of cards
-        :param city: current city
-        :param category_lat_name: current category
-        :return: if all_cards do not have information about vacancy
-                 the function returns "False" else returns "None"
-        """
-
-        def convert_date(list_of_items):
-            """
-            convert_date is a function to convert date from string to datetime.date format
-            :param list_of_items: list of information about date
-            :return: datetime.date
-            """
-            month = int(list_of_items[1] \
-                        .replace('січня', '1').replace('лютого', '2').replace('березня', '3') \
-                        .replace('квітня', '4').replace('травня', '5').replace('червня', '6') \
-                        .replace('липня', '7').replace('серпня', '8').replace('вересня', '9') \
-                        .replace('жовтня', '10').replace('листопада', '11').replace('грудня', '12'))
-            day = int(list_of_items[0])
-            year = int(list_of_items[2])
-            return datetime.date(year, month, day)
-
-        vacancy_links = (list(map(lambda j: None if j.a is None else \
-            f'{site_link}{j.a.get("href")}', all_cards)))
-        vacancy_ids = (list(map(lambda j: None if j is None else \
-            j.replace(f'{site_link}/jobs/', '').replace('/', ''), vacancy_links)))
-        temp = (list(map(lambda j: None if j.a is None else \
-            j.a.get('title').split(", вакансія від "), all_cards)))
-        vacancy_titles = (list(map(lambda j: None if j == [] else j[0], temp)))
-        temp_dates = (list(map(lambda j: None if j == [] else j[1].split(' '), temp)))
-        publication_dates = (list(map(convert_date, temp_dates)))
-        company_titles = (list(map(lambda i: None if i.b is None else i.b.get_text(), all_cards)))
-        vacancy_salaries = (list(map(lambda j: None if j.find('span', class_=sal) is None else \
-            int(j.find('span', class_=sal) \
-                .get_text() \
-                .replace('\xa0', '') \
-                .replace('грн', '') \
-                .replace('*', '')), all_cards)))
-        multiplay = len(vacancy_ids)
-
-        vacancy_cities = ((city + "===") * multiplay).split("===")[:-1]
-        vacancy_categories = ((category_lat_name + "===") * multiplay).split("===")[:-1]
-        data = {"vacancy_id": vacancy_ids, "vacancy_link": vacancy_links,
-                "vacancy_title": vacancy_titles, "company_title": company_titles,
-                "vacancy_salary": vacancy_salaries, "publication_date": publication_dates,
-                "vacancy_city": vacancy_cities, "vacancy_category": vacancy_categories}
-        if not data['vacancy_id']:
-            return False
-        temp_result = pd.DataFrame.from_dict(data)
-        temp_result.to_sql(f'work_ua_vacancies_{datetime.date.today()}',
-                           postgres_engine,
-                           if_exists='append')
-        print(city, category_lat_name, datetime.datetime.now())
-
-    for city_name in cities:
-        for category in categories:
-            page_number = 1
-            url = f"{site_link}/jobs-{city_name}-{category}/?page={page_number}"
-            response = requests.get(url)
-            results_page = BeautifulSoup(response.content, 'lxml')
-            while results_page.find('b').get_text() != empty_page:
-                cards = results_page.find_all('div', class_=cards1)
-                if cards:
-                    parse_cards(cards, city_name, category)
-
-                cards = results_page.find_all('div', class_=cards2)
-                if cards:
-                    parse_cards(cards, city_name, category)
-                page_number += 1
-                url = f"{site_link}/jobs-{city_name}-{category}/?page={page_number}"
-                response = requests.get(url)
-                results_page = BeautifulSoup(response.content, 'lxml')
-    result_sql = f'SELECT * FROM public."work_ua_vacancies_{datetime.date.today()}"'
-    return pd.read_sql(result_sql, postgres_engine)
+    postgres_engine = engine if engine is not None else connect_to_database()
+    crawl_date = datetime.date.today()
+    for _ in iter_vacancies(cities, categories, batch_size, flush_interval, incremental,
+                            postgres_engine, site_link, workers, prefetch, resume, processes):
+        pass
+    return read_entity(postgres_engine, 'work_ua_vacancies', crawl_date)